@@ -0,0 +1,23 @@
+"""
+ASGI config for djobs project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+e.g. for ``uvicorn djobs.asgi:application``. Set DJOBS_ASYNC_VIEWS=True to use
+the async variants of the public and PDF views.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djobs.settings")
+
+application = get_asgi_application()
+
+if settings.PDF_PRELOAD:
+    from djobs.core.pdf import preload
+    preload()
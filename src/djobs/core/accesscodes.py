@@ -0,0 +1,32 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+from djobs.core.models import AccessCode
+
+# Stored for codes that do not exist, so repeated bad codes don't hit the database
+MISSING = 'missing'
+
+
+def code_key(code):
+    return 'djobs:code:{}'.format(hashlib.sha1(code.encode()).hexdigest())
+
+
+def resolve_code(code):
+    # Returns the access code with its job opening (if any) already attached, or None. Only codes that do not exist
+    # are cached: loading an existing one takes the same single query as checking a cached primary key would.
+    if not code:
+        return None
+    key = code_key(code)
+    if cache.get(key) == MISSING:
+        return None
+
+    obj = AccessCode.objects.select_related('job').filter(code=code).first()
+    if obj is None:
+        cache.set(key, MISSING, settings.ACCESS_CODE_CACHE_TIMEOUT)
+    return obj
+
+
+def invalidate_code(code):
+    cache.delete(code_key(code))
@@ -1,19 +1,62 @@
+from django.conf import settings
 from django.contrib.admin import AdminSite, ModelAdmin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.crypto import constant_time_compare
 
-from djobs.core.models import JobOpening, AccessCode
+from djobs.core import metrics
+from djobs.core.models import JobOpening, AccessCode, PrintRun
 
 
 class CRMAdminSite(AdminSite):
     site_header = 'djobs'
 
+    def get_urls(self):
+        return [
+            path('metrics/', self.metrics_view, name='metrics'),
+        ] + super().get_urls()
+
+    def metrics_view(self, request):
+        # Scrapers can authenticate with "Authorization: Bearer <DJOBS_METRICS_TOKEN>" instead of a staff login
+        token = settings.METRICS_TOKEN
+        if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer ' + token):
+            return self._metrics(request)
+        return self.admin_view(self._metrics)(request)
+
+    def _metrics(self, request):
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 class AccessCodeAdmin(ModelAdmin):
     list_display = ['code', 'tag']
 
 
+class JobOpeningAdmin(ModelAdmin):
+    list_display = ['company_name', 'job_title', 'job_location', 'access_code', 'active', 'public', 'print_card',
+                    'updated']
+    list_filter = ['active', 'public', 'print_card']
+    list_select_related = ['access_code']
+    search_fields = ['company_name', 'job_title']
+    ordering = ['company_name', 'id']
+    show_full_result_count = False
+    raw_id_fields = ['access_code']
+
+    def save_model(self, request, obj, form, change):
+        # The admin form validates images itself, so they don't need background processing
+        if 'logo' in form.changed_data:
+            obj.logo_state = JobOpening.LOGO_READY
+        super().save_model(request, obj, form, change)
+
+
+class PrintRunAdmin(ModelAdmin):
+    list_display = ['pk', 'created', 'created_by', 'state', 'done', 'total', 'finished']
+    readonly_fields = ['created', 'finished', 'total', 'done', 'base', 'manifest']
+
+
 site = CRMAdminSite(name='admin')
-site.register(JobOpening)
+site.register(JobOpening, JobOpeningAdmin)
 site.register(AccessCode, AccessCodeAdmin)
+site.register(PrintRun, PrintRunAdmin)
 site.register(User, UserAdmin)
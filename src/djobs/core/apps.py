@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = 'djobs.core'
+
+    def ready(self):
+        from djobs.core import checks, signals  # noqa
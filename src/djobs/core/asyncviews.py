@@ -0,0 +1,99 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryFile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+
+from djobs.core.connections import task_finished, task_started
+from djobs.core.views import (
+    ImagePreView, JobDetailView, JobListView, LayoutPreView, PrintAll, PrintPreView, add_public_cache_headers,
+    cached_public_response, public_cache_state,
+)
+
+# Async variants of the public and PDF views, used when DJOBS_ASYNC_VIEWS is set and the site is served
+# through djobs.asgi. Synchronous views share a single thread under ASGI, so one slow render would hold up
+# every other request. Here, cached pages are looked up without waiting for that thread, and card rendering runs
+# in a separate pool of DJOBS_ASYNC_RENDER_THREADS threads.
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_RENDER_THREADS, thread_name_prefix='djobs-render')
+    return _executor
+
+
+def _offloaded(fn, args):
+    task_started()
+    try:
+        return fn(*args)
+    finally:
+        task_finished()
+
+
+async def run_in_executor(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor(), _offloaded, fn, args)
+
+
+def _cached_response(request):
+    digest, last_modified = public_cache_state(request)
+    response = cached_public_response(request, digest, last_modified)
+    if response is not None:
+        response = add_public_cache_headers(response, digest, last_modified)
+    return response
+
+
+# The cache API is synchronous (and DatabaseCache must not run on the event loop at all), so lookups run in
+# asgiref's thread pool, without queueing behind the synchronous views or the renders
+_cache_lookup = sync_to_async(_offloaded, thread_sensitive=False)
+
+
+def public_view(view_class):
+    view = sync_to_async(view_class.as_view())
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            response = await _cache_lookup(_cached_response, (request,))
+            if response is not None:
+                return response
+        return await view(request, *args, **kwargs)
+
+    return async_view
+
+
+def _spooled(response):
+    # Streaming responses are iterated on the event loop, so the PDF is written to a file first
+    if not isinstance(response, StreamingHttpResponse) or isinstance(response, FileResponse):
+        return response
+    f = TemporaryFile()
+    for chunk in response.streaming_content:
+        f.write(chunk)
+    f.seek(0)
+    spooled = FileResponse(f, content_type=response['Content-Type'])
+    if response.has_header('Content-Disposition'):
+        spooled['Content-Disposition'] = response['Content-Disposition']
+    return spooled
+
+
+def render_view(view_class):
+    view = view_class.as_view()
+
+    def run(request, args, kwargs):
+        return _spooled(view(request, *args, **kwargs))
+
+    async def async_view(request, *args, **kwargs):
+        return await run_in_executor(run, request, args, kwargs)
+
+    return async_view
+
+
+job_list = public_view(JobListView)
+job_detail = public_view(JobDetailView)
+print_preview = render_view(PrintPreView)
+image_preview = render_view(ImagePreView)
+layout_preview = render_view(LayoutPreView)
+print_all = render_view(PrintAll)
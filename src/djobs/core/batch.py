@@ -0,0 +1,94 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+
+from djobs.core import metrics
+from djobs.core.cardcache import has_cached_card, render_card
+from djobs.core.imposition import ImposedWriter
+from djobs.core.pdfstream import StreamingPdfWriter
+from djobs.core.qr import precompute
+from djobs.core.workers import init_worker, render_chunk
+
+# Cards per task sent to a worker. Small enough that few cards are still rendered after the client disconnects, see
+# render_cards.
+MAX_CHUNK_SIZE = 8
+
+
+def _mp_context():
+    # Print runs and the ASGI render pool call this from threaded processes. A forked child could inherit a lock
+    # (QR code cache, metrics, backgrounds) held by another thread and deadlock, so workers start from a clean
+    # process instead.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def render_cards(openings, processes=None):
+    # Cached cards are loaded one at a time as they are yielded, so memory does not grow with the board
+    openings = list(openings)
+    cached = [has_cached_card(o) for o in openings]
+    missing = [o for o, c in zip(openings, cached) if not c]
+    processes = min(processes or settings.PRINT_PROCESSES, len(missing))
+
+    if processes <= 1:
+        precompute(missing)
+        for o in openings:
+            yield render_card(o)
+        return
+
+    card_cache = settings.CACHES[settings.PDF_CARD_CACHE]
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=_mp_context(), initializer=init_worker,
+                                   initargs=(card_cache,))
+    # Each worker precomputes the QR codes of a chunk before rendering it
+    size = max(1, min(MAX_CHUNK_SIZE, len(missing) // (processes * 4)))
+    futures = [executor.submit(render_chunk, missing[i:i + size]) for i in range(0, len(missing), size)]
+    try:
+        rendered = _merged_chunks(futures)
+        for o, c in zip(openings, cached):
+            # A card evicted since the check above is rendered here
+            yield render_card(o) if c else next(rendered)
+    finally:
+        # When the client disconnects (GeneratorExit) or rendering fails, pending chunks are dropped instead of
+        # rendered for nobody. Only the few already handed to the workers still finish.
+        for f in futures:
+            f.cancel()
+        executor.shutdown()
+
+
+def _merged_chunks(futures):
+    for f in futures:
+        cards, worker_metrics = f.result()
+        metrics.merge(worker_metrics)
+        yield from cards
+
+
+def _writer(fhandle, layout=None):
+    writer = StreamingPdfWriter(fhandle)
+    if layout:
+        writer = ImposedWriter(writer, layout)
+    return writer
+
+
+def write_merged(cards, fhandle, layout=None):
+    writer = _writer(fhandle, layout)
+    for data in cards:
+        writer.add_pdf(data)
+    writer.close()
+
+
+def stream_merged(cards, layout=None):
+    buffer = BytesIO()
+    writer = _writer(buffer, layout)
+    try:
+        for data in cards:
+            writer.add_pdf(data)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    finally:
+        # Stops the rendering right away when the response is closed early, see render_cards
+        if hasattr(cards, 'close'):
+            cards.close()
+    writer.close()
+    yield buffer.getvalue()
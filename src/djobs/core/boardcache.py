@@ -0,0 +1,23 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'djobs:board:version'
+
+
+def board_version():
+    # The version doubles as the board's modification timestamp
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time(), None)
+        version = cache.get(VERSION_KEY) or time.time()
+    return version
+
+
+def bump_board_version():
+    cache.set(VERSION_KEY, time.time(), None)
+
+
+def page_digest(version, path):
+    return hashlib.md5('{}:{}'.format(version, path).encode()).hexdigest()
@@ -0,0 +1,72 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from djobs.core import metrics
+from djobs.core.models import JobOpening
+from djobs.core.raster import rasterize
+from djobs.core.utils import file_digest, opening_digest
+
+
+def card_cache():
+    return caches[settings.PDF_CARD_CACHE]
+
+
+def card_key(obj: JobOpening):
+    from djobs.core.pdf import PDFGenerator, backgrounds
+
+    parts = [
+        str(PDFGenerator.version),
+        settings.SITE_URL,
+        str(settings.PDF_SHRINK_TO_FIT),
+        opening_digest(obj),
+        file_digest(backgrounds.path(PDFGenerator(obj).background_name)),
+    ]
+    return 'card:{}'.format(hashlib.sha256('|'.join(parts).encode()).hexdigest())
+
+
+def _pointer_key(pk):
+    return 'card:pk:{}'.format(pk)
+
+
+def has_cached_card(obj: JobOpening):
+    # Only checks for the card, so batches can decide what to render without loading every cached PDF
+    return bool(obj.pk) and card_cache().has_key(card_key(obj))
+
+
+def render_card(obj: JobOpening):
+    from djobs.core.pdf import PDFGenerator
+
+    if not obj.pk:
+        return PDFGenerator(obj).create_pdf()
+
+    cache = card_cache()
+    key = card_key(obj)
+    data = cache.get(key)
+    metrics.inc('card_cache_misses' if data is None else 'card_cache_hits')
+    if data is None:
+        data = PDFGenerator(obj).create_pdf()
+        cache.set(key, data, None)
+        cache.set(_pointer_key(obj.pk), key, None)
+    return data
+
+
+def render_card_image(obj: JobOpening, width):
+    if not obj.pk:
+        return rasterize(render_card(obj), width)
+
+    cache = card_cache()
+    key = '{}:png:{}'.format(card_key(obj), width)
+    data = cache.get(key)
+    if data is None:
+        data = rasterize(render_card(obj), width)
+        cache.set(key, data, None)
+    return data
+
+
+def invalidate_card(pk):
+    cache = card_cache()
+    key = cache.get(_pointer_key(pk))
+    if key:
+        cache.delete_many([key, _pointer_key(pk)] + ['{}:png:{}'.format(key, w) for w in settings.PDF_PREVIEW_WIDTHS])
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    # Each process has its own LocMemCache, so saves in one worker would not invalidate the pages of the others
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or not backend.endswith('LocMemCache'):
+        return []
+    return [Warning(
+        'The default cache is local to each process.',
+        hint='Public pages and access codes are cached there and are only invalidated in the process that saved '
+             'the change. Use a shared backend such as FileBasedCache, Redis or Memcached (DJOBS_CACHE_BACKEND).',
+        id='djobs.W001',
+    )]
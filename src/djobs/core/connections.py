@@ -0,0 +1,21 @@
+from django import db
+
+# Persistent connections (DJOBS_DB_CONN_MAX_AGE) can be dropped by the database server or a connection pooler
+# while they are idle. With DJOBS_DB_CONN_HEALTH_CHECKS, they are pinged before they are reused and reopened if
+# necessary, like CONN_HEALTH_CHECKS does in Django 4.1.
+
+
+def check_connections():
+    for conn in db.connections.all():
+        if conn.connection is not None and conn.settings_dict.get('CONN_HEALTH_CHECKS') and not conn.is_usable():
+            conn.close()
+
+
+def task_started():
+    # Thread pools run outside of the request cycle, so they handle their connections like a request would
+    db.close_old_connections()
+    check_connections()
+
+
+def task_finished():
+    db.close_old_connections()
@@ -0,0 +1,83 @@
+from io import BytesIO
+
+from PyPDF2 import PdfFileReader
+from reportlab.lib import pagesizes
+from reportlab.lib.units import mm
+
+from djobs.core import metrics
+
+# Sheet size, columns and rows. A5 cards fill both sheets exactly, so they are scaled down slightly
+# to leave room for the crop marks in the margin.
+LAYOUTS = {
+    'a4-2up': (pagesizes.portrait(pagesizes.A4), 1, 2),
+    'a3-4up': (pagesizes.landscape(pagesizes.A3), 2, 2),
+}
+
+MARGIN = 10 * mm
+MARK_OFFSET = 2 * mm
+MARK_LENGTH = 6 * mm
+
+
+class ImposedWriter:
+    # Wraps a StreamingPdfWriter and places the added cards onto sheets, each card page written once as a
+    # form XObject
+
+    def __init__(self, writer, layout):
+        self.writer = writer
+        self.sheetsize, self.columns, self.rows = LAYOUTS[layout]
+        self.forms = []
+
+    def add_pdf(self, data):
+        reader = PdfFileReader(BytesIO(data))
+        for page in reader.pages:
+            self.forms.append(self.writer.add_form(page))
+            if len(self.forms) == self.columns * self.rows:
+                self._sheet()
+
+    def _sheet(self):
+        sheet_width, sheet_height = self.sheetsize
+        # All cards on a sheet share the cell size of the first one
+        llx, lly, urx, ury = self.forms[0][1]
+        width, height = urx - llx, ury - lly
+        scale = min(1.0, (sheet_width - 2 * MARGIN) / (self.columns * width),
+                    (sheet_height - 2 * MARGIN) / (self.rows * height))
+        cell_width, cell_height = width * scale, height * scale
+        x0 = (sheet_width - self.columns * cell_width) / 2
+        y0 = (sheet_height - self.rows * cell_height) / 2
+
+        ops = []
+        xobjects = {}
+        for i, (ref, box) in enumerate(self.forms):
+            # Fill rows from the top of the sheet
+            column, row = i % self.columns, self.rows - 1 - i // self.columns
+            x, y = x0 + column * cell_width, y0 + row * cell_height
+            name = '/Card{}'.format(i)
+            xobjects[name] = ref
+            ops.append('q {s:.6f} 0 0 {s:.6f} {x:.4f} {y:.4f} cm {name} Do Q'.format(
+                s=scale, x=x - box[0] * scale, y=y - box[1] * scale, name=name,
+            ))
+
+        ops.append('q 0.25 w 0 G')
+        x1, y1 = x0 + self.columns * cell_width, y0 + self.rows * cell_height
+        for i in range(self.columns + 1):
+            x = x0 + i * cell_width
+            ops.append(self._line(x, y0 - MARK_OFFSET, x, y0 - MARK_OFFSET - MARK_LENGTH))
+            ops.append(self._line(x, y1 + MARK_OFFSET, x, y1 + MARK_OFFSET + MARK_LENGTH))
+        for i in range(self.rows + 1):
+            y = y0 + i * cell_height
+            ops.append(self._line(x0 - MARK_OFFSET, y, x0 - MARK_OFFSET - MARK_LENGTH, y))
+            ops.append(self._line(x1 + MARK_OFFSET, y, x1 + MARK_OFFSET + MARK_LENGTH, y))
+        ops.append('Q')
+
+        self.writer.add_sheet(sheet_width, sheet_height, '\n'.join(ops), xobjects)
+        metrics.inc('pages_merged', len(self.forms))
+        self.forms = []
+
+    @staticmethod
+    def _line(x1, y1, x2, y2):
+        return '{:.4f} {:.4f} m {:.4f} {:.4f} l S'.format(x1, y1, x2, y2)
+
+    def close(self, info=None):
+        if self.forms:
+            self._sheet()
+        self.writer.close(info)
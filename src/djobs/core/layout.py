@@ -0,0 +1,52 @@
+from math import floor
+
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph
+
+
+def measure_story(story, width, height):
+    # Lays out a list of (field, flowable) tuples like a truncating KeepInFrame of the given size
+    # would, without drawing anything
+    fields = []
+    y = 0
+    for i, (field, flowable) in enumerate(story):
+        if i:
+            y += flowable.getSpaceBefore()
+        w, h = flowable.wrap(width, height)
+        top = y
+        y += h
+        if field:
+            entry = {
+                'field': field,
+                'fits': y <= height,
+                'visible': 1.0 if y <= height else round(max(0.0, height - top) / h, 3),
+            }
+            if isinstance(flowable, Paragraph):
+                lines = len(flowable.blPara.lines)
+                entry['lines'] = lines
+                entry['visible_lines'] = min(lines, max(0, floor((height - top) / flowable.style.leading)))
+            fields.append(entry)
+        if i < len(story) - 1:
+            y += flowable.getSpaceAfter()
+
+    return {
+        'width_mm': round(width / mm, 1),
+        'height_mm': round(height / mm, 1),
+        'used_mm': round(y / mm, 1),
+        'fits': y <= height,
+        'fields': fields,
+    }
+
+
+def fit_scale(make_story, width, height, minimum=0.5, steps=7):
+    # Binary-searches the largest font scale in [minimum, 1] for which make_story(scale) fits
+    if measure_story(make_story(1.0), width, height)['fits']:
+        return 1.0
+    lo, hi = minimum, 1.0
+    for _ in range(steps):
+        mid = (lo + hi) / 2
+        if measure_story(make_story(mid), width, height)['fits']:
+            lo = mid
+        else:
+            hi = mid
+    return round(lo, 3)
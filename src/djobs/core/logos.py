@@ -0,0 +1,55 @@
+import os
+
+from PIL import Image
+from django.conf import settings
+
+from djobs.core.utils import file_digest
+
+# Bounding boxes in pixels: the card's 70x30 mm logo box at 300 dpi, and the detail page's card image
+LOGO_VARIANTS = {
+    'print': (827, 354),
+    'web': (800, 400),
+}
+
+
+def _variant_names(digest, variant):
+    return ['logos/{}-{}.{}'.format(digest, variant, ext) for ext in ('png', 'jpg')]
+
+
+def create_variant(path, variant):
+    digest = file_digest(path)
+    for name in _variant_names(digest, variant):
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+            return name
+
+    with Image.open(path) as im:
+        im.draft('RGB', LOGO_VARIANTS[variant])
+        transparent = im.mode in ('RGBA', 'LA', 'PA') or 'transparency' in im.info
+        im = im.convert('RGBA' if transparent else 'RGB')
+        im.thumbnail(LOGO_VARIANTS[variant], Image.LANCZOS)
+
+        png_name, jpg_name = _variant_names(digest, variant)
+        name = png_name if transparent else jpg_name
+        target = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = '{}.{}.tmp'.format(target, os.getpid())
+        if transparent:
+            im.save(tmp, 'PNG', optimize=True)
+        else:
+            im.save(tmp, 'JPEG', quality=90, optimize=True, progressive=True)
+        os.replace(tmp, target)
+    return name
+
+
+def logo_variant(obj, variant):
+    if not obj.logo_ready:
+        return None
+    try:
+        return create_variant(obj.logo.path, variant)
+    except OSError:
+        return obj.logo.name
+
+
+def create_variants(obj):
+    for variant in LOGO_VARIANTS:
+        logo_variant(obj, variant)
@@ -0,0 +1,175 @@
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import time
+from io import BytesIO
+
+import reportlab
+from PIL import Image
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.utils.crypto import get_random_string
+from reportlab.pdfgen.canvas import Canvas
+
+from djobs.core import qr
+from djobs.core.batch import render_cards, write_merged
+from djobs.core.models import JobOpening
+from djobs.core.pdf import PDFGenerator
+
+WORDS = ('django', 'python', 'conference', 'remote', 'backend', 'frontend', 'team', 'product', 'customers',
+         'database', 'testing', 'deployment', 'open', 'source', 'community', 'we', 'are', 'looking', 'for')
+TEXT_LENGTHS = (20, 150, 600)
+LOGO_SIZES = (None, (400, 200), (5000, 2000))
+
+
+class NullWriter:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def peak_rss_kb():
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks card rendering with synthetic job openings and prints the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--counts', default='10,100,1000',
+                            help='Comma-separated card counts for the merge benchmark')
+        parser.add_argument('--samples', type=int, default=50, help='Number of cards to time per rendering stage')
+        parser.add_argument('--processes', type=int, default=None, help='Worker processes for the merge benchmark')
+        parser.add_argument('--with-cache', action='store_true', help='Use the configured card cache')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON results to this file instead of stdout')
+
+    def _logos(self):
+        paths = {}
+        for size in LOGO_SIZES:
+            if size is None:
+                continue
+            name = os.path.join(self.logo_dir, 'logo-{}x{}.png'.format(*size))
+            im = Image.new('RGB', size, (255, 255, 255))
+            for i in range(0, size[0], 50):
+                im.paste((random.randrange(256), 90, 30), (i, 0, i + 25, size[1]))
+            im.save(os.path.join(settings.MEDIA_ROOT, name))
+            paths[size] = name
+        return paths
+
+    def _openings(self, n, logos):
+        def text(words):
+            return ' '.join(random.choice(WORDS) for _ in range(words))
+
+        openings = []
+        for i in range(n):
+            size = LOGO_SIZES[i % len(LOGO_SIZES)]
+            openings.append(JobOpening(
+                pk=i + 1,
+                job_title=text(4).title(),
+                job_location='Heidelberg',
+                job_remote=bool(i % 2),
+                job_salary_range='50k-70k' if i % 3 else None,
+                job_description=text(TEXT_LENGTHS[i % len(TEXT_LENGTHS)]),
+                company_name='Company {:05d}'.format(i),
+                company_description=text(TEXT_LENGTHS[(i + 1) % len(TEXT_LENGTHS)]),
+                company_contact='jobs@example.org',
+                logo=logos.get(size),
+            ))
+        return openings
+
+    def _time(self, func, items, reset=None):
+        # reset runs before each item and is left out of the timings
+        durations = []
+        for item in items:
+            if reset:
+                reset()
+            t = time.perf_counter()
+            func(item)
+            durations.append(time.perf_counter() - t)
+        total = sum(durations)
+        return {
+            'count': len(durations),
+            'total_s': total,
+            'throughput_per_s': len(durations) / total if total else None,
+            'mean_ms': statistics.mean(durations) * 1000,
+            'p50_ms': percentile(durations, 50) * 1000,
+            'p95_ms': percentile(durations, 95) * 1000,
+            'peak_rss_kb': peak_rss_kb(),
+        }
+
+    def _draw_qr(self, obj):
+        PDFGenerator(obj)._draw_qr(Canvas(BytesIO(), pagesize=PDFGenerator.pagesize), None)
+
+    def _merge(self, openings, processes):
+        out = NullWriter()
+        start = time.perf_counter()
+        write_merged(render_cards(openings, processes), out)
+        total = time.perf_counter() - start
+        return {
+            'count': len(openings),
+            'total_s': total,
+            'throughput_per_s': len(openings) / total,
+            'bytes': out.size,
+            'peak_rss_kb': peak_rss_kb(),
+        }
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.logo_dir = 'benchmark-{}'.format(get_random_string(8))
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, self.logo_dir))
+        caches = dict(settings.CACHES)
+        if not options['with_cache']:
+            caches[settings.PDF_CARD_CACHE] = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+
+        try:
+            with override_settings(CACHES=caches):
+                logos = self._logos()
+                samples = self._openings(options['samples'], logos)
+                # Warm up fonts, backgrounds and logo derivatives for every sample, so that no stage pays for them. QR
+                # codes are cleared before each card instead, as a print run encodes them anew.
+                for obj in samples:
+                    PDFGenerator(obj).create_pdf()
+
+                results = {
+                    'meta': {
+                        'generator_version': PDFGenerator.version,
+                        'compositing': settings.PDF_COMPOSITING,
+                        'processes': options['processes'] or settings.PRINT_PROCESSES,
+                        'card_cache': options['with_cache'],
+                        'python': platform.python_version(),
+                        'reportlab': reportlab.Version,
+                        'timestamp': time.time(),
+                    },
+                    'build_doc': self._time(lambda o: PDFGenerator(o).build_doc(BytesIO()), samples,
+                                            reset=qr.clear_cache),
+                    'create_pdf': self._time(lambda o: PDFGenerator(o).create_pdf(), samples, reset=qr.clear_cache),
+                    'draw_qr': {'cold': self._time(self._draw_qr, samples, reset=qr.clear_cache)},
+                    'print_all': {},
+                }
+                qr.precompute(samples)
+                results['draw_qr']['warm'] = self._time(self._draw_qr, samples)
+                for n in [int(c) for c in options['counts'].split(',') if c]:
+                    results['print_all'][str(n)] = self._merge(self._openings(n, logos), options['processes'])
+        finally:
+            shutil.rmtree(os.path.join(settings.MEDIA_ROOT, self.logo_dir), ignore_errors=True)
+
+        data = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(data)
+        else:
+            self.stdout.write(data)
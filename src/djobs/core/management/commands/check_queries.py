@@ -0,0 +1,179 @@
+import re
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from djobs.core.models import AccessCode, JobOpening
+from djobs.core.pagination import decode_cursor, encode_cursor, seek
+from djobs.core.printruns import printable_openings
+from djobs.core.views import JobDetailView, JobListView
+
+# Plan lines that mean the table is read in full or re-sorted instead of walked along an index
+SCAN_PATTERNS = {
+    'sqlite': [r'^SCAN (TABLE )?core_jobopening$', r'USE TEMP B-TREE FOR ORDER BY'],
+    'postgresql': [r'Seq Scan on core_jobopening', r'^\s*(->\s*)?Sort\b'],
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Checks query counts and EXPLAIN plans of the job list, job detail and print querysets, and that public '
+            'pages do not use the session')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Number of synthetic job openings to create')
+
+    def _populate(self, rows):
+        prefix = 'QC' + get_random_string(6)
+        AccessCode.objects.bulk_create([
+            AccessCode(code='{}{:06d}'.format(prefix, i), tag='check_queries') for i in range(rows)
+        ])
+        codes = AccessCode.objects.filter(code__startswith=prefix).order_by('code')
+        JobOpening.objects.bulk_create([
+            JobOpening(
+                access_code=code,
+                active=i % 10 != 0,
+                public=i % 3 != 0,
+                print_card=i % 4 != 0,
+                job_title='Job {}'.format(i),
+                job_location='Location {}'.format(i % 20),
+                job_description='Description',
+                company_name='Company {:05d}'.format(i % (rows // 2 or 1)),
+                company_contact='jobs@example.org',
+            )
+            for i, code in enumerate(codes)
+        ])
+
+    def _explain(self, qs):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                return [row[-1] for row in cursor.fetchall()]
+            if connection.vendor == 'postgresql':
+                # Tiny tables are always scanned sequentially, so only ask whether an index *could* be used
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute('EXPLAIN ' + sql, params)
+            return [' '.join(str(c) for c in row) for row in cursor.fetchall()]
+
+    def _check(self, name, func, budget, querysets):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        failures = []
+        if len(queries) > budget:
+            failures.append('{} queries, expected at most {}'.format(len(queries), budget))
+
+        plans = []
+        for qs in querysets:
+            plan = self._explain(qs)
+            plans.append(plan)
+            for line in plan:
+                for pattern in SCAN_PATTERNS.get(connection.vendor, []):
+                    if re.search(pattern, line.strip() if connection.vendor == 'sqlite' else line):
+                        failures.append('plan contains "{}"'.format(line.strip()))
+
+        style = self.style.ERROR if failures else self.style.SUCCESS
+        self.stdout.write(style('{}: {} ({} queries)'.format(name, 'FAIL' if failures else 'OK', len(queries))))
+        for failure in failures:
+            self.stdout.write('  ' + failure)
+        if self.verbosity > 1:
+            for q in queries:
+                self.stdout.write('  SQL: ' + q['sql'])
+            for plan in plans:
+                for line in plan:
+                    self.stdout.write('  PLAN: ' + line)
+        return not failures
+
+    def _check_session(self, name, path):
+        # Public pages are cached and shared, so they must neither read nor write the visitor's session. The
+        # request carries a session cookie, like it would after submitting the form.
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session['check_queries'] = True
+        session.save()
+        hosts = [h for h in settings.ALLOWED_HOSTS if h != '*']
+        client = Client(SERVER_NAME=hosts[0] if hosts else 'localhost')
+        client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        with CaptureQueriesContext(connection) as queries:
+            # A unique query string, so the page is rendered instead of served from the public page cache
+            response = client.get(path, {'check': get_random_string(12)})
+        failures = []
+        if response.status_code != 200:
+            failures.append('status {}'.format(response.status_code))
+        if any('django_session' in q['sql'] for q in queries):
+            failures.append('session table was queried')
+        if 'Cookie' in response.get('Vary', ''):
+            failures.append('session was accessed (Vary: Cookie)')
+        if response.cookies:
+            failures.append('response sets cookies: {}'.format(', '.join(response.cookies)))
+
+        style = self.style.ERROR if failures else self.style.SUCCESS
+        self.stdout.write(style('{}: {}'.format(name, 'FAIL' if failures else 'OK')))
+        for failure in failures:
+            self.stdout.write('  ' + failure)
+        return not failures
+
+    def _list_view(self, path):
+        view = JobListView(request=self.factory.get(path), args=(), kwargs={})
+        view.object_list = view.get_queryset()
+        return view
+
+    def _render_list(self, path):
+        view = self._list_view(path)
+        list(view.get_context_data()['jobs'])
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.factory = RequestFactory()
+        try:
+            with transaction.atomic():
+                self._populate(options['rows'])
+                ok = self._run()
+                raise Rollback()
+        except Rollback:
+            pass
+        if not ok:
+            raise CommandError('Query checks failed')
+
+    def _run(self):
+        public = JobListView.ordering
+        first = self._list_view('/jobs/').get_queryset().order_by(*public)
+        cursor = encode_cursor(first[10], public)
+        page_size = JobListView.paginate_by
+        detail_pk = first[0].pk
+
+        def detail():
+            JobDetailView(request=self.factory.get('/'), args=(), kwargs={'pk': detail_pk}).get_object()
+
+        def print_all():
+            for opening in printable_openings():
+                opening.access_code.tag
+
+        results = [
+            self._check('job list', lambda: self._render_list('/jobs/'), 3, [
+                first[:page_size + 1],
+            ]),
+            self._check('job list, next page', lambda: self._render_list('/jobs/?after=' + cursor), 3, [
+                first.filter(seek(public, decode_cursor(cursor, public)))[:page_size + 1],
+            ]),
+            self._check('job detail', detail, 1, [
+                JobDetailView(request=self.factory.get('/'), args=(), kwargs={}).get_queryset().filter(pk=detail_pk),
+            ]),
+            self._check('print all', print_all, 1, [
+                printable_openings(),
+            ]),
+            self._check_session('job list, session', reverse('job.list')),
+            self._check_session('job detail, session', reverse('job.detail', kwargs={'pk': detail_pk})),
+        ]
+        return all(results)
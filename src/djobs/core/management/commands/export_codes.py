@@ -0,0 +1,41 @@
+import csv
+
+from django.core.management.base import BaseCommand
+
+from djobs.core.models import AccessCode, JobOpening
+
+FIELDS = ['code', 'tag', 'job_id', 'company_name', 'job_title', 'active', 'public', 'print_card']
+
+
+class Command(BaseCommand):
+    help = 'Exports access codes and the status of their job openings as CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', help='Output file, defaults to stdout')
+        parser.add_argument('--tag')
+
+    def _rows(self, tag):
+        qs = AccessCode.objects.select_related('job').order_by('pk')
+        if tag:
+            qs = qs.filter(tag=tag)
+        for ac in qs.iterator(chunk_size=2000):
+            try:
+                job = ac.job
+            except JobOpening.DoesNotExist:
+                yield [ac.code, ac.tag or '', '', '', '', '', '', '']
+            else:
+                yield [ac.code, ac.tag or '', job.pk, job.company_name, job.job_title, job.active, job.public,
+                       job.print_card]
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file'], 'w', newline='', encoding='utf-8') as f:
+                self._export(f, options['tag'])
+        else:
+            self._export(self.stdout, options['tag'])
+
+    def _export(self, f, tag):
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for row in self._rows(tag):
+            writer.writerow(row)
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from djobs.core.logos import logo_variant
+from djobs.core.models import JobOpening
+from djobs.core.utils import opening_digest
+
+MANIFEST = '.djobs-export.json'
+
+
+class Command(BaseCommand):
+    help = 'Renders the public job board into a directory that can be served without Django'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only rewrite pages of job openings that changed since the last export')
+
+    def _write(self, url, content):
+        path = os.path.join(self.directory, url.lstrip('/'), 'index.html')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+
+    def _copy_media(self, name):
+        target = os.path.join(self.directory, settings.MEDIA_URL.lstrip('/'), name)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(settings.MEDIA_ROOT, name), target)
+
+    def handle(self, *args, **options):
+        self.directory = options['directory']
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        old_manifest = {}
+        if options['incremental'] and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                old_manifest = json.load(f)
+
+        jobs = list(JobOpening.objects.filter(active=True, public=True).order_by('company_name'))
+        manifest = {}
+        written = 0
+        for job in jobs:
+            digest = manifest[str(job.pk)] = opening_digest(job)
+            if old_manifest.get(str(job.pk)) == digest:
+                continue
+            if job.logo_ready:
+                self._copy_media(logo_variant(job, 'web'))
+            content = render_to_string('core/detail.html', {'job': job})
+            self._write(reverse('job.detail', kwargs={'pk': job.pk}), content)
+            written += 1
+
+        for pk in set(old_manifest) - set(manifest):
+            shutil.rmtree(os.path.join(self.directory, reverse('job.detail', kwargs={'pk': pk}).lstrip('/')),
+                          ignore_errors=True)
+
+        if manifest != old_manifest or not options['incremental']:
+            context = {'jobs': jobs, 'static_export': True}
+            self._write(reverse('job.list'), render_to_string('core/list.html', context))
+
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        self.stdout.write('Wrote {} of {} job pages to {}'.format(written, len(jobs), self.directory))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from djobs.core.models import AccessCode, new_code
+
+
+class Command(BaseCommand):
+    help = 'Generates access codes in bulk and prints them, one per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--tag', help='Tag for the new codes, e.g. a sponsor tier')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--retries', type=int, default=5, help='Attempts per batch on code collisions')
+
+    def _create_batch(self, size, tag, retries):
+        for attempt in range(retries):
+            codes = {new_code() for _ in range(size)}
+            codes -= set(AccessCode.objects.filter(code__in=codes).values_list('code', flat=True))
+            try:
+                with transaction.atomic():
+                    AccessCode.objects.bulk_create([AccessCode(code=c, tag=tag) for c in codes])
+                return codes
+            except IntegrityError:
+                # Somebody else created one of our codes in the meantime
+                continue
+        raise CommandError('Could not create unique codes after {} attempts'.format(retries))
+
+    def handle(self, *args, **options):
+        remaining = options['count']
+        while remaining > 0:
+            codes = self._create_batch(min(remaining, options['batch_size']), options['tag'], options['retries'])
+            for c in codes:
+                self.stdout.write(c)
+            remaining -= len(codes)
@@ -0,0 +1,42 @@
+import csv
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from djobs.core.models import AccessCode
+
+
+class Command(BaseCommand):
+    help = 'Imports access codes from a CSV file with a "code" and an optional "tag" column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file')
+        parser.add_argument('--tag', help='Tag for rows that do not have one')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = skipped = 0
+        with open(options['file'], newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if 'code' not in (reader.fieldnames or []):
+                raise CommandError('The CSV file needs a "code" column.')
+
+            while True:
+                rows = list(islice(reader, options['batch_size']))
+                if not rows:
+                    break
+                codes = {}
+                for row in rows:
+                    code = row['code'].strip()
+                    if code:
+                        codes[code] = row.get('tag') or options['tag']
+                existing = set(AccessCode.objects.filter(code__in=codes.keys()).values_list('code', flat=True))
+                with transaction.atomic():
+                    AccessCode.objects.bulk_create(
+                        [AccessCode(code=c, tag=t) for c, t in codes.items() if c not in existing]
+                    )
+                created += len(codes) - len(existing)
+                skipped += len(rows) - len(codes) + len(existing)
+
+        self.stdout.write('Created {} codes, skipped {} rows'.format(created, skipped))
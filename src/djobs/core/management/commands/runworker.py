@@ -0,0 +1,49 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from djobs.core.connections import task_finished, task_started
+from djobs.core.models import JobOpening, PrintRun
+from djobs.core.printruns import execute_run, fail_stale_runs
+from djobs.core.uploads import process_logo
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Processes pending background work: uploaded logos and print runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit after processing all pending work')
+        parser.add_argument('--interval', type=float, default=2.0, help='Polling interval in seconds')
+
+    def _run(self, description, fn, *args):
+        # One failing task (e.g. a print run with a broken logo) must not stop the worker. Print runs record
+        # their failure on the run before the exception gets here.
+        task_started()
+        try:
+            return fn(*args)
+        except Exception:
+            logger.exception('{} failed'.format(description))
+        finally:
+            task_finished()
+
+    def handle(self, *args, **options):
+        while True:
+            stale = self._run('Checking for interrupted print runs', fail_stale_runs)
+            if stale:
+                self.stdout.write('Marked {} interrupted print run(s) as failed'.format(stale))
+
+            logos = JobOpening.objects.filter(logo_state=JobOpening.LOGO_PROCESSING).order_by('updated')
+            for pk in logos.values_list('pk', flat=True):
+                self.stdout.write('Processing logo of job opening #{}'.format(pk))
+                self._run('Logo of job opening #{}'.format(pk), process_logo, pk)
+
+            runs = PrintRun.objects.filter(state=PrintRun.STATE_PENDING).order_by('created')
+            for pk in runs.values_list('pk', flat=True):
+                self.stdout.write('Processing print run #{}'.format(pk))
+                self._run('Print run #{}'.format(pk), execute_run, pk)
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# In-process metrics for the rendering pipeline. Each process keeps its own numbers, so every series carries a
+# pid label: scrapes through a load balancer then yield one steadily increasing series per process. Print
+# worker processes send their numbers back to the parent with each card, see collect() and merge().
+
+COUNTERS = {
+    'card_renders': 'Cards rendered by PDFGenerator.create_pdf',
+    'card_cache_hits': 'Card cache lookups that found a rendered card',
+    'card_cache_misses': 'Card cache lookups that had to render',
+    'card_bytes': 'Bytes of card PDFs produced',
+    'pages_merged': 'Pages written into merged print PDFs',
+}
+
+STAGES = {
+    'create_pdf': 'Complete card rendering, including all stages below',
+    'build': 'reportlab layout and serialization of the card',
+    'background': 'Drawing the background form or image',
+    'logo': 'Loading the logo for the card',
+    'qr': 'Drawing the QR code',
+    'merge': 'Merging the card onto the background page with PyPDF2',
+    'write': 'Serializing the merged PDF with PyPDF2',
+    'rasterize': 'Rasterizing a card preview image',
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_timers = defaultdict(lambda: [0, 0.0])
+
+
+def inc(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(stage, seconds):
+    with _lock:
+        timer = _timers[stage]
+        timer[0] += 1
+        timer[1] += seconds
+
+
+@contextmanager
+def timer(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def collect():
+    # Returns the numbers recorded since the last call and starts over
+    with _lock:
+        data = dict(_counters), {k: tuple(v) for k, v in _timers.items()}
+        _counters.clear()
+        _timers.clear()
+    return data
+
+
+def merge(data):
+    counters, timers = data
+    with _lock:
+        for name, value in counters.items():
+            _counters[name] += value
+        for stage, (count, total) in timers.items():
+            timer = _timers[stage]
+            timer[0] += count
+            timer[1] += total
+
+
+def render():
+    # Prometheus text exposition format, version 0.0.4
+    with _lock:
+        counters = dict(_counters)
+        timers = {k: list(v) for k, v in _timers.items()}
+
+    pid = os.getpid()
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines.append('# HELP djobs_{}_total {}'.format(name, help_text))
+        lines.append('# TYPE djobs_{}_total counter'.format(name))
+        lines.append('djobs_{}_total{{pid="{}"}} {}'.format(name, pid, counters.get(name, 0)))
+
+    lines.append('# HELP djobs_render_stage_seconds Time spent per card rendering stage')
+    lines.append('# TYPE djobs_render_stage_seconds summary')
+    for stage in STAGES:
+        count, total = timers.get(stage, (0, 0.0))
+        lines.append('djobs_render_stage_seconds_count{{stage="{}",pid="{}"}} {}'.format(stage, pid, count))
+        lines.append('djobs_render_stage_seconds_sum{{stage="{}",pid="{}"}} {:.6f}'.format(stage, pid, total))
+    return '\n'.join(lines) + '\n'
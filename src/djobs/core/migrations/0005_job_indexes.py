@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobopening',
+            index=models.Index(fields=['company_name', 'id'], name='core_job_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobopening',
+            index=models.Index(fields=['active', 'public', 'print_card'], name='core_job_flags_idx'),
+        ),
+    ]
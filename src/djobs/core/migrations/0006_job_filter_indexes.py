@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_job_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='jobopening',
+            name='core_job_flags_idx',
+        ),
+        migrations.AddIndex(
+            model_name='jobopening',
+            index=models.Index(fields=['active', 'public', 'company_name', 'id'], name='core_job_public_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobopening',
+            index=models.Index(fields=['active', 'print_card', 'company_name', 'id'], name='core_job_print_idx'),
+        ),
+    ]
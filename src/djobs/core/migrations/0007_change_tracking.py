@@ -0,0 +1,43 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+from djobs.core.utils import opening_digest
+
+
+def forwards(apps, schema_editor):
+    JobOpening = apps.get_model('core', 'JobOpening')
+    for opening in JobOpening.objects.all():
+        JobOpening.objects.filter(pk=opening.pk).update(content_hash=opening_digest(opening))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_job_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobopening',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='jobopening',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='printrun',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.PrintRun'),
+        ),
+        migrations.AddField(
+            model_name='printrun',
+            name='manifest',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_change_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobopening',
+            name='logo_state',
+            field=models.CharField(choices=[('ready', 'Ready'), ('processing', 'Processing'), ('invalid', 'Invalid')], default='ready', editable=False, max_length=190),
+        ),
+    ]
@@ -0,0 +1,33 @@
+import os
+import shutil
+
+import djobs.core.storage
+from django.conf import settings
+from django.db import migrations, models
+
+
+def move_files(apps, schema_editor):
+    # Finished print runs used to be written to MEDIA_ROOT, where they could be downloaded by anyone
+    PrintRun = apps.get_model('core', 'PrintRun')
+    for name in PrintRun.objects.exclude(file='').exclude(file=None).values_list('file', flat=True):
+        source = os.path.join(settings.MEDIA_ROOT, name)
+        if os.path.exists(source):
+            target = os.path.join(settings.PRIVATE_ROOT, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(source, target)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_printrun_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='printrun',
+            name='file',
+            field=models.FileField(blank=True, null=True, storage=djobs.core.storage.private_storage, upload_to='printruns/'),
+        ),
+        migrations.RunPython(move_files, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,13 @@
+import json
+
+from django.conf import settings
 from django.db import models
 from django.utils.crypto import get_random_string
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import gettext_lazy as _
+
+from djobs.core.logos import logo_variant
+from djobs.core.storage import private_storage
+from djobs.core.utils import opening_digest
 
 
 def new_code():
@@ -16,6 +23,15 @@ class AccessCode(models.Model):
 
 
 class JobOpening(models.Model):
+    LOGO_READY = 'ready'
+    LOGO_PROCESSING = 'processing'
+    LOGO_INVALID = 'invalid'
+    LOGO_STATES = (
+        (LOGO_READY, _('Ready')),
+        (LOGO_PROCESSING, _('Processing')),
+        (LOGO_INVALID, _('Invalid')),
+    )
+
     access_code = models.OneToOneField(
         AccessCode, related_name='job', on_delete=models.PROTECT
     )
@@ -83,6 +99,86 @@ class JobOpening(models.Model):
         blank=True,
         verbose_name=_('Company logo')
     )
+    # Uploaded logos are verified in the background, see djobs.core.uploads.process_logo
+    logo_state = models.CharField(max_length=190, choices=LOGO_STATES, default=LOGO_READY, editable=False)
+
+    updated = models.DateTimeField(auto_now=True)
+    # Digest of everything printed on the card, see djobs.core.utils.opening_digest
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the job list and the admin changelist, see djobs.core.pagination
+            models.Index(fields=['company_name', 'id'], name='core_job_company_idx'),
+            # JobListView, JobDetailView and the admin filters on active/public
+            models.Index(fields=['active', 'public', 'company_name', 'id'], name='core_job_public_idx'),
+            # PrintAll and print runs, see djobs.core.printruns.printable_openings
+            models.Index(fields=['active', 'print_card', 'company_name', 'id'], name='core_job_print_idx'),
+        ]
 
     def __str__(self):
-        return '{} at {}'.format(self.job_title, self.company_name)
\ No newline at end of file
+        return '{} at {}'.format(self.job_title, self.company_name)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Computed after saving, once the object has a pk and an uploaded logo is stored
+        content_hash = opening_digest(self)
+        if content_hash != self.content_hash:
+            self.content_hash = content_hash
+            JobOpening.objects.filter(pk=self.pk).update(content_hash=content_hash)
+
+    @property
+    def logo_ready(self):
+        return bool(self.logo) and self.logo_state == self.LOGO_READY
+
+    @property
+    def web_logo_url(self):
+        name = logo_variant(self, 'web')
+        return settings.MEDIA_URL + name if name else None
+
+
+class PrintRun(models.Model):
+    STATE_PENDING = 'pending'
+    STATE_RUNNING = 'running'
+    STATE_DONE = 'done'
+    STATE_FAILED = 'failed'
+    STATES = (
+        (STATE_PENDING, _('Pending')),
+        (STATE_RUNNING, _('Running')),
+        (STATE_DONE, _('Done')),
+        (STATE_FAILED, _('Failed')),
+    )
+
+    created = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL
+    )
+    finished = models.DateTimeField(null=True, blank=True)
+    # Updated while the run makes progress, so runs whose worker died can be detected
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    state = models.CharField(max_length=190, choices=STATES, default=STATE_PENDING)
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    # Contains cards of non-public openings, so it is only served by PrintRunDownloadView
+    file = models.FileField(upload_to='printruns/', storage=private_storage, null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Only print cards that are new or changed since this run
+    base = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    # JSON mapping of the pk of every printable opening at the time of the run to its content hash
+    manifest = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ('-created',)
+
+    def __str__(self):
+        return 'Print run #{}'.format(self.pk)
+
+    @property
+    def manifest_data(self):
+        return json.loads(self.manifest) if self.manifest else {}
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0 if self.state == self.STATE_DONE else 0.0
+        return self.done / self.total
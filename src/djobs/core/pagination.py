@@ -0,0 +1,91 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(obj, fields):
+    values = [getattr(obj, f) for f in fields]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode())
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(fields):
+        return None
+    if not all(_valid(f, v) for f, v in zip(fields, values)):
+        return None
+    return values
+
+
+def _valid(field, value):
+    # Cursors come from the query string, so a tampered one must not reach the database with values it rejects
+    if field == 'pk':
+        return type(value) is int and -2 ** 63 <= value < 2 ** 63
+    return isinstance(value, str) and '\x00' not in value
+
+
+def seek(fields, values, reverse=False):
+    # Builds "(a, b) > (x, y)" as (a > x) OR (a = x AND b > y), which the database can answer from an
+    # index on (a, b) without skipping rows like OFFSET does
+    lookup = 'lt' if reverse else 'gt'
+    condition = Q()
+    for i in range(len(fields) - 1, -1, -1):
+        step = Q(**{'{}__{}'.format(fields[i], lookup): values[i]})
+        if i < len(fields) - 1:
+            step |= Q(**{fields[i]: values[i]}) & condition
+        condition = step
+    return condition
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.fields = fields
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next:
+            return encode_cursor(self.object_list[-1], self.fields)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous:
+            return encode_cursor(self.object_list[0], self.fields)
+
+
+def keyset_page(qs, fields, size, after=None, before=None):
+    # ``fields`` must uniquely identify a row, e.g. ('company_name', 'pk'). Invalid cursors and cursors past either
+    # end of the list fall back to the first page.
+    if after:
+        values = decode_cursor(after, fields)
+        if values is not None:
+            rows = list(qs.filter(seek(fields, values)).order_by(*fields)[:size + 1])
+            if rows:
+                return KeysetPage(rows[:size], fields, has_next=len(rows) > size, has_previous=True)
+    elif before:
+        values = decode_cursor(before, fields)
+        if values is not None:
+            rows = list(qs.filter(seek(fields, values, reverse=True)).order_by(
+                *['-' + f for f in fields]
+            )[:size + 1])
+            if rows:
+                return KeysetPage(rows[:size][::-1], fields, has_next=True, has_previous=len(rows) > size)
+
+    rows = list(qs.order_by(*fields)[:size + 1])
+    return KeysetPage(rows[:size], fields, has_next=len(rows) > size, has_previous=False)
@@ -1,80 +1,224 @@
 import copy
+import threading
 
 import os
 from PyPDF2 import PdfFileReader, PdfFileWriter
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject, ContentStream
 from django.conf import settings
 from django.contrib.staticfiles import finders
-from django.urls import reverse
 from django.utils.functional import cached_property
 from io import BytesIO
 
 from django.utils.html import escape
-from reportlab.graphics import renderPDF
-from reportlab.graphics.barcode.qr import QrCodeWidget
-from reportlab.graphics.shapes import Drawing
 from reportlab.lib import pagesizes, utils
 from reportlab.lib.styles import StyleSheet1, ParagraphStyle
 from reportlab.lib.units import mm
 from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFDictionary, PDFName, PDFStream
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.platypus import BaseDocTemplate, PageTemplate, Frame, Paragraph, KeepInFrame, FrameBreak, Spacer, Image
-from urllib.parse import urljoin
 
+from djobs.core import metrics
+from djobs.core.layout import fit_scale, measure_story
+from djobs.core.logos import logo_variant
 from djobs.core.models import JobOpening
+from djobs.core.qr import detail_url, qr_code
 
 
-class PDFGenerator:
-    pagesize = pagesizes.landscape(pagesizes.A5)
+class BackgroundRegistry:
 
-    def __init__(self, obj: JobOpening):
-        self.obj = obj
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = {}
 
-    @staticmethod
-    def _init_fonts():
+    def path(self, name):
+        path = settings.PDF_BACKGROUNDS[name]
+        if os.path.isabs(path):
+            return path
+        return finders.find(path)
+
+    def is_raster(self, name):
+        return os.path.splitext(settings.PDF_BACKGROUNDS[name])[1].lower() in ('.png', '.jpg', '.jpeg')
+
+    def _cached(self, key, loader):
+        value = self._pages.get(key)
+        if value is None:
+            with self._lock:
+                value = self._pages.get(key)
+                if value is None:
+                    value = self._pages[key] = loader()
+        return value
+
+    def get(self, name='default'):
+        return self._cached(name, lambda: self._load(name))
+
+    def image(self, name='default'):
+        return self._cached(('image', name), lambda: utils.ImageReader(self.path(name)))
+
+    def draw(self, name, canvas, width, height):
+        with metrics.timer('background'):
+            if self.is_raster(name):
+                canvas.drawImage(self.image(name), 0, 0, width, height)
+                return
+
+            formname = 'djobsbg{}'.format(sorted(settings.PDF_BACKGROUNDS).index(name))
+            if not canvas.hasForm(formname):
+                self._define_form(name, canvas._doc, formname)
+            canvas.doForm(formname)
+
+    def _define_form(self, name, rldoc, formname):
+        page = self.get(name)
+        memo = {}
+        contents = page.getContents()
+        if isinstance(contents, ArrayObject):
+            contents = ContentStream(contents, page.pdf)
+        form = PDFStream(PDFDictionary({
+            'Type': PDFName('XObject'),
+            'Subtype': PDFName('Form'),
+            'FormType': 1,
+            'BBox': self._convert(rldoc, page['/MediaBox'], memo),
+            'Resources': self._convert(rldoc, page['/Resources'], memo),
+        }), contents.getData())
+        rldoc.Reference(form, rldoc.getXObjectName(formname))
+
+    def _convert(self, rldoc, obj, memo):
+        # Converts a parsed PyPDF2 object into a reportlab PDF object of the document ``rldoc``
+        indirect = isinstance(obj, IndirectObject)
+        if indirect:
+            key = (obj.idnum, obj.generation)
+            if key in memo:
+                return memo[key]
+            obj = obj.getObject()
+
+        if isinstance(obj, StreamObject):
+            rlobj = PDFStream(PDFDictionary(), obj._data, filters=[])
+            items = rlobj.dictionary.dict
+            result = rldoc.Reference(rlobj)
+        elif isinstance(obj, DictionaryObject):
+            rlobj = PDFDictionary()
+            items = rlobj.dict
+            result = rldoc.Reference(rlobj) if indirect else rlobj
+        elif isinstance(obj, ArrayObject):
+            rlobj = PDFArray([])
+            items = None
+            result = rldoc.Reference(rlobj) if indirect else rlobj
+        else:
+            out = BytesIO()
+            obj.writeToStream(out, None)
+            return out.getvalue()
+
+        if indirect:
+            memo[key] = result
+        if items is None:
+            rlobj.sequence.extend(self._convert(rldoc, value, memo) for value in obj)
+        else:
+            for k, value in obj.items():
+                if k not in ('/Parent', '/Length'):
+                    items[k[1:]] = self._convert(rldoc, value, memo)
+        return result
+
+    def _load(self, name):
+        with open(self.path(name), 'rb') as f:
+            reader = PdfFileReader(BytesIO(f.read()))
+        page = reader.getPage(0)
+        # Resolve everything up front, so the shared page never needs to read from the reader again
+        self._resolve(page, set())
+        return page
+
+    def _resolve(self, obj, seen):
+        if isinstance(obj, IndirectObject):
+            if (obj.idnum, obj.generation) in seen:
+                return
+            seen.add((obj.idnum, obj.generation))
+            obj = obj.getObject()
+        if isinstance(obj, StreamObject):
+            obj.getData()
+        if isinstance(obj, DictionaryObject):
+            for key, value in obj.items():
+                if key != '/Parent':
+                    self._resolve(value, seen)
+        elif isinstance(obj, ArrayObject):
+            for value in obj:
+                self._resolve(value, seen)
+
+
+backgrounds = BackgroundRegistry()
+
+_fonts_lock = threading.Lock()
+_fonts_loaded = False
+
+
+def ensure_fonts():
+    # Parsing the TTF files is slow, so it happens on first render (or in preload()) instead of on import
+    global _fonts_loaded
+    if _fonts_loaded:
+        return
+    with _fonts_lock:
+        if _fonts_loaded:
+            return
         pdfmetrics.registerFont(TTFont('Gandhi-R', finders.find('font/GandhiSans-Regular-webfont.ttf')))
         pdfmetrics.registerFont(TTFont('Gandhi-BI', finders.find('font/GandhiSans-BoldItalic-webfont.ttf')))
         pdfmetrics.registerFont(TTFont('Gandhi-I', finders.find('font/GandhiSans-Italic-webfont.ttf')))
         pdfmetrics.registerFont(TTFont('Gandhi-B', finders.find('font/GandhiSans-Bold-webfont.ttf')))
         pdfmetrics.registerFontFamily('Gandhi', normal='Gandhi-R', bold='Gandhi-B',
                                       italic='Gandhi-I', boldItalic='Gandhi-BI')
+        _fonts_loaded = True
+
+
+def preload():
+    # Loads fonts and backgrounds up front, e.g. in a pre-forking server's master process so that
+    # workers share them copy-on-write
+    ensure_fonts()
+    for name in settings.PDF_BACKGROUNDS:
+        if backgrounds.is_raster(name):
+            backgrounds.image(name)
+        else:
+            backgrounds.get(name)
+
+
+class PDFGenerator:
+    version = 3
+    pagesize = pagesizes.landscape(pagesizes.A5)
+
+    # (id, x, y, width, height) of the frames the job and company stories are laid out in
+    frames = (
+        ('job', 15 * mm, 15 * mm, 100 * mm, 120 * mm),
+        ('company', 125 * mm, 25 * mm, 70 * mm, 110 * mm),
+    )
+
+    def __init__(self, obj: JobOpening, shrink_to_fit=None):
+        self.obj = obj
+        self.shrink_to_fit = settings.PDF_SHRINK_TO_FIT if shrink_to_fit is None else shrink_to_fit
+
+    @cached_property
+    def background_name(self):
+        if len(settings.PDF_BACKGROUNDS) > 1 and self.obj.access_code_id:
+            tag = self.obj.access_code.tag
+            if tag in settings.PDF_BACKGROUNDS:
+                return tag
+        return 'default'
+
+    @cached_property
+    def overlay(self):
+        return settings.PDF_COMPOSITING == 'overlay' or backgrounds.is_raster(self.background_name)
 
     @cached_property
     def stylesheet(self):
+        return self.get_stylesheet()
+
+    def get_stylesheet(self, scale=1.0):
         stylesheet = StyleSheet1()
-        stylesheet.add(ParagraphStyle(name='Normal', fontName='Gandhi-R', fontSize=10, leading=12))
-        stylesheet.add(ParagraphStyle(name='Heading1', fontName='Gandhi-B', fontSize=16, leading=20))
-        stylesheet.add(ParagraphStyle(name='Meta', fontName='Gandhi-I', fontSize=10, leading=12))
+        stylesheet.add(ParagraphStyle(name='Normal', fontName='Gandhi-R', fontSize=10 * scale, leading=12 * scale))
+        stylesheet.add(ParagraphStyle(name='Heading1', fontName='Gandhi-B', fontSize=16 * scale, leading=20 * scale))
+        stylesheet.add(ParagraphStyle(name='Meta', fontName='Gandhi-I', fontSize=10 * scale, leading=12 * scale))
         stylesheet.add(ParagraphStyle(name='Message', spaceBefore=2 * mm, parent=stylesheet['Normal']))
         return stylesheet
 
-    def build_doc(self, fhandle):
-        def text(s):
-            return escape(s).replace("\n", "<br/>")
-
-        doc = BaseDocTemplate(fhandle, pagesize=self.pagesize)
-        frames = [
-            Frame(
-                15 * mm,
-                15 * mm,
-                100 * mm,
-                120 * mm,
-                leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0,
-                id='normal',
-            ),
-            Frame(
-                125 * mm,
-                25 * mm,
-                70 * mm,
-                110 * mm,
-                leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0,
-                id='normal'
-            ),
-        ]
-        doc.addPageTemplates([
-            PageTemplate(id='AllPages', frames=frames, pagesize=self.pagesize,
-                         onPage=self._draw_qr)
-        ])
+    @staticmethod
+    def _text(s):
+        return escape(s).replace("\n", "<br/>")
 
+    def job_story(self, stylesheet):
         meta = []
         if self.obj.job_location:
             meta.append('Location: {}'.format(self.obj.job_location))
@@ -84,81 +228,144 @@ class PDFGenerator:
             meta.append('Salary: {}'.format(self.obj.job_salary_range))
         meta = ' · '.join(meta)
 
+        return [
+            ('job_title', Paragraph(self._text(self.obj.job_title), style=stylesheet['Heading1'])),
+            (None, Spacer(1 * mm, 2 * mm)),
+            ('meta', Paragraph(self._text(meta), style=stylesheet['Meta'])),
+            (None, Spacer(1 * mm, 2 * mm)),
+            ('job_description', Paragraph(self._text(self.obj.job_description), style=stylesheet['Normal'])),
+        ]
+
+    def company_story(self, stylesheet):
         company_story = []
-        if self.obj.logo:
-            im = Image(
-                os.path.join(settings.MEDIA_ROOT, self.obj.logo.name),
-                height=30 * mm, width=70 * mm,
-                kind='proportional'
-            )
-            company_story.append(im)
-            company_story.append(Spacer(1 * mm, 3 * mm))
+        if self.obj.logo_ready:
+            with metrics.timer('logo'):
+                im = Image(
+                    os.path.join(settings.MEDIA_ROOT, logo_variant(self.obj, 'print')),
+                    height=30 * mm, width=70 * mm,
+                    kind='proportional'
+                )
+            company_story.append(('logo', im))
+            company_story.append((None, Spacer(1 * mm, 3 * mm)))
 
         company_story.append(
-            Paragraph(text(self.obj.company_name), style=self.stylesheet['Heading1']),
+            ('company_name', Paragraph(self._text(self.obj.company_name), style=stylesheet['Heading1'])),
         )
         company_story.append(
-            Paragraph(text(self.obj.company_description), style=self.stylesheet['Normal']),
+            ('company_description', Paragraph(self._text(self.obj.company_description), style=stylesheet['Normal'])),
         )
         if self.obj.company_contact:
-            company_story.append(Spacer(1 * mm, 3 * mm))
+            company_story.append((None, Spacer(1 * mm, 3 * mm)))
             company_story.append(
-                Paragraph('Contact', style=self.stylesheet['Heading1']),
+                (None, Paragraph('Contact', style=stylesheet['Heading1'])),
             )
             company_story.append(
-                Paragraph(text(self.obj.company_contact), style=self.stylesheet['Normal']),
+                ('company_contact', Paragraph(self._text(self.obj.company_contact), style=stylesheet['Normal'])),
             )
+        return company_story
+
+    def stories(self):
+        # Fonts are only needed to lay out text, not e.g. to compute a card's cache key
+        ensure_fonts()
+        stories = {}
+        for name, x, y, width, height in self.frames:
+            make_story = getattr(self, '{}_story'.format(name))
+            scale = 1.0
+            if self.shrink_to_fit:
+                scale = fit_scale(lambda s: make_story(self.get_stylesheet(s)), width, height,
+                                  minimum=settings.PDF_SHRINK_MIN_SCALE)
+            stories[name] = scale, make_story(self.stylesheet if scale == 1.0 else self.get_stylesheet(scale))
+        return stories
 
-        doc.build([
-            KeepInFrame(110 * mm, 120 * mm, [
-                Paragraph(text(self.obj.job_title), style=self.stylesheet['Heading1']),
-                Spacer(1 * mm, 2 * mm),
-                Paragraph(text(meta), style=self.stylesheet['Meta']),
-                Spacer(1 * mm, 2 * mm),
-                Paragraph(text(self.obj.job_description), style=self.stylesheet['Normal'])
-            ], mode='truncate'),
-            FrameBreak(),
-            KeepInFrame(70 * mm, 110 * mm, company_story, mode='truncate')
+    def measure(self):
+        frames = {}
+        stories = self.stories()
+        for name, x, y, width, height in self.frames:
+            scale, story = stories[name]
+            frames[name] = measure_story(story, width, height)
+            frames[name]['scale'] = scale
+        return {
+            'fits': all(f['fits'] for f in frames.values()),
+            'shrink_to_fit': self.shrink_to_fit,
+            'frames': frames,
+        }
+
+    def build_doc(self, fhandle, background=False):
+        def on_page(canvas, doc):
+            if background:
+                canvas.saveState()
+                backgrounds.draw(self.background_name, canvas, *self.pagesize)
+                canvas.restoreState()
+            self._draw_qr(canvas, doc)
+
+        doc = BaseDocTemplate(fhandle, pagesize=self.pagesize, title='Preview', creator='djobs')
+        frames = [
+            Frame(
+                x, y, width, height,
+                leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0,
+                id='normal',
+            )
+            for name, x, y, width, height in self.frames
+        ]
+        doc.addPageTemplates([
+            PageTemplate(id='AllPages', frames=frames, pagesize=self.pagesize,
+                         onPage=on_page)
         ])
 
+        stories = self.stories()
+        with metrics.timer('build'):
+            doc.build([
+                KeepInFrame(110 * mm, 120 * mm, [f for field, f in stories['job'][1]], mode='truncate'),
+                FrameBreak(),
+                KeepInFrame(70 * mm, 110 * mm, [f for field, f in stories['company'][1]], mode='truncate')
+            ])
+
     def _draw_qr(self, canvas, doc):
-        canvas.saveState()
+        with metrics.timer('qr'):
+            canvas.saveState()
 
-        qrw = QrCodeWidget(
-            urljoin(settings.SITE_URL, reverse('job.detail', kwargs={'pk': self.obj.pk})),
-            barHeight=20 * mm, barWidth=20 * mm
-        )
-        d = Drawing(20 * mm, 20 * mm)
-        d.add(qrw)
-        qr_x = 175 * mm
-        qr_y = 2.2 * mm
-        renderPDF.draw(d, canvas, qr_x, qr_y)
+            qr_x = 175 * mm
+            qr_y = 2.2 * mm
+            canvas.translate(qr_x, qr_y)
+            canvas.addLiteral(qr_code(detail_url(self.obj.pk)))
 
-        canvas.restoreState()
+            canvas.restoreState()
 
     def create_pdf(self, background=True):
+        with metrics.timer('create_pdf'):
+            data = self._create_pdf(background)
+        metrics.inc('card_renders')
+        metrics.inc('card_bytes', len(data))
+        return data
+
+    def _create_pdf(self, background):
         buffer = BytesIO()
+        if background and self.overlay:
+            # Draw the background as a form XObject in the same pass as the card itself
+            self.build_doc(buffer, background=True)
+            return buffer.getvalue()
+
         self.build_doc(buffer)
         buffer.seek(0)
 
         new_pdf = PdfFileReader(buffer)
         output = PdfFileWriter()
-        bgf = open(finders.find('background.pdf'), "rb")
-        bg_pdf = PdfFileReader(bgf)
 
-        for page in new_pdf.pages:
-            bg_page = copy.copy(bg_pdf.getPage(0))
-            bg_page.mergePage(page)
-            output.addPage(bg_page)
+        with metrics.timer('merge'):
+            for page in new_pdf.pages:
+                if background:
+                    bg_page = copy.copy(backgrounds.get(self.background_name))
+                    bg_page.mergePage(page)
+                    output.addPage(bg_page)
+                else:
+                    output.addPage(page)
 
         output.addMetadata({
             '/Title': 'Preview',
             '/Creator': 'djobs',
         })
         outbuffer = BytesIO()
-        output.write(outbuffer)
+        with metrics.timer('write'):
+            output.write(outbuffer)
         outbuffer.seek(0)
         return outbuffer.read()
-
-
-PDFGenerator._init_fonts()
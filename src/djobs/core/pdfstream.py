@@ -0,0 +1,152 @@
+from io import BytesIO
+
+from PyPDF2 import PdfFileReader
+from PyPDF2.generic import (
+    ArrayObject, ContentStream, DecodedStreamObject, DictionaryObject, FloatObject, IndirectObject, NameObject,
+    NumberObject, TextStringObject,
+)
+
+from djobs.core import metrics
+
+
+class StreamingPdfWriter:
+    # Concatenates PDF documents into fhandle page by page. Objects are written out as soon as a
+    # document is added, so only their offsets are kept in memory instead of the whole output.
+
+    def __init__(self, fhandle):
+        self.fhandle = fhandle
+        self.position = 0
+        self.offsets = []
+        self.pages = []
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        self.pages_ref = self._reserve()
+
+    def _write(self, data):
+        self.fhandle.write(data)
+        self.position += len(data)
+
+    def _reserve(self):
+        self.offsets.append(None)
+        return IndirectObject(len(self.offsets), 0, None)
+
+    def _write_object(self, ref, obj):
+        self.offsets[ref.idnum - 1] = self.position
+        buffer = BytesIO()
+        buffer.write('{} 0 obj\n'.format(ref.idnum).encode())
+        obj.writeToStream(buffer, None)
+        buffer.write(b'\nendobj\n')
+        self._write(buffer.getvalue())
+
+    def add_pdf(self, data):
+        reader = PdfFileReader(BytesIO(data))
+        for page in reader.pages:
+            self.add_page(page)
+            metrics.inc('pages_merged')
+
+    def _write_tree(self, ref, obj, mapping=None, extra=None):
+        # Renumbers all objects reachable from obj and writes them. The source reader is thrown
+        # away afterwards, so the parsed objects are rewritten in place. ``extra`` entries are
+        # added to obj after renumbering, so they may refer to objects of this writer.
+        mapping = {} if mapping is None else mapping
+        pending = [(ref, obj)]
+
+        def remap(obj):
+            if isinstance(obj, IndirectObject):
+                key = (obj.idnum, obj.generation)
+                if key not in mapping:
+                    mapping[key] = self._reserve()
+                    pending.append((mapping[key], obj.getObject()))
+                return mapping[key]
+            if isinstance(obj, DictionaryObject):
+                for k, v in list(obj.items()):
+                    obj[k] = remap(v)
+            elif isinstance(obj, ArrayObject):
+                for i, v in enumerate(obj):
+                    obj[i] = remap(v)
+            return obj
+
+        while pending:
+            r, o = pending.pop()
+            o = remap(o)
+            if r == ref and extra:
+                o.update(extra)
+            self._write_object(r, o)
+
+    def add_page(self, page):
+        page_ref = self._reserve()
+        mapping = {}
+        if getattr(page, 'indirectRef', None) is not None:
+            mapping[(page.indirectRef.idnum, page.indirectRef.generation)] = page_ref
+        del page[NameObject('/Parent')]
+        self._write_tree(page_ref, page, mapping, extra={NameObject('/Parent'): self.pages_ref})
+        self.pages.append(page_ref)
+
+    def add_form(self, page):
+        # Writes the page as a form XObject instead, so it can be placed on other pages.
+        # Returns its reference and media box.
+        contents = page.getContents()
+        if isinstance(contents, ArrayObject):
+            contents = ContentStream(contents, page.pdf)
+        form = DecodedStreamObject()
+        form.setData(contents.getData())
+        form = form.flateEncode()
+        box = page.mediaBox
+        form.update({
+            NameObject('/Type'): NameObject('/XObject'),
+            NameObject('/Subtype'): NameObject('/Form'),
+            NameObject('/BBox'): ArrayObject([FloatObject(float(v)) for v in box]),
+            NameObject('/Resources'): page.get('/Resources', DictionaryObject()),
+        })
+        ref = self._reserve()
+        self._write_tree(ref, form)
+        return ref, [float(v) for v in box]
+
+    def add_sheet(self, width, height, content, xobjects):
+        # Adds a page drawing ``content`` with the given form XObjects, e.g. {'/C0': ref}
+        stream = DecodedStreamObject()
+        stream.setData(content.encode())
+        stream_ref = self._reserve()
+        self._write_object(stream_ref, stream.flateEncode())
+
+        page_ref = self._reserve()
+        self._write_object(page_ref, DictionaryObject({
+            NameObject('/Type'): NameObject('/Page'),
+            NameObject('/Parent'): self.pages_ref,
+            NameObject('/MediaBox'): ArrayObject([NumberObject(0), NumberObject(0),
+                                                  FloatObject(width), FloatObject(height)]),
+            NameObject('/Resources'): DictionaryObject({
+                NameObject('/XObject'): DictionaryObject({NameObject(k): v for k, v in xobjects.items()}),
+            }),
+            NameObject('/Contents'): stream_ref,
+        }))
+        self.pages.append(page_ref)
+
+    def close(self, info=None):
+        self._write_object(self.pages_ref, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(self.pages),
+            NameObject('/Count'): NumberObject(len(self.pages)),
+        }))
+        root = self._reserve()
+        self._write_object(root, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): self.pages_ref,
+        }))
+        info_ref = self._reserve()
+        self._write_object(info_ref, DictionaryObject({
+            NameObject(k): TextStringObject(v) for k, v in (info or {'/Creator': 'djobs'}).items()
+        }))
+
+        xref = self.position
+        lines = ['xref', '0 {}'.format(len(self.offsets) + 1), '0000000000 65535 f ']
+        lines += ['{:010d} 00000 n '.format(o) for o in self.offsets]
+        self._write(('\n'.join(lines) + '\n').encode())
+        self._write(b'trailer\n')
+        buffer = BytesIO()
+        DictionaryObject({
+            NameObject('/Size'): NumberObject(len(self.offsets) + 1),
+            NameObject('/Root'): root,
+            NameObject('/Info'): info_ref,
+        }).writeToStream(buffer, None)
+        self._write(buffer.getvalue())
+        self._write('\nstartxref\n{}\n%%EOF\n'.format(xref).encode())
@@ -0,0 +1,98 @@
+import datetime
+import json
+from tempfile import TemporaryFile
+
+from django.conf import settings
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from django.utils.translation import gettext as _
+
+from djobs.core import tasks
+from djobs.core.models import JobOpening, PrintRun
+
+
+def printable_openings():
+    return JobOpening.objects.filter(active=True, print_card=True).select_related('access_code').order_by(
+        'company_name', 'pk',
+    )
+
+
+def changed_openings(openings, since=None, base=None):
+    # Openings that were created or changed since a timestamp or since they were printed by the run ``base``
+    if base is not None:
+        manifest = base.manifest_data
+        openings = openings.filter(updated__gt=base.created)
+        return [o for o in openings if manifest.get(str(o.pk)) != o.content_hash]
+    if since is not None:
+        openings = openings.filter(updated__gt=since)
+    return list(openings)
+
+
+def manifest(openings):
+    return json.dumps({str(pk): h for pk, h in openings.values_list('pk', 'content_hash')}, sort_keys=True)
+
+
+def start_run(user=None, base=None):
+    run = PrintRun.objects.create(created_by=user, base=base)
+    transaction.on_commit(lambda: tasks.submit(execute_run, run.pk))
+    return run
+
+
+def claim_run(pk):
+    return PrintRun.objects.filter(pk=pk, state=PrintRun.STATE_PENDING).update(
+        state=PrintRun.STATE_RUNNING, heartbeat=now(),
+    ) == 1
+
+
+def fail_stale_runs():
+    # Runs whose worker thread or process was killed would otherwise stay running forever
+    cutoff = now() - datetime.timedelta(seconds=settings.PRINT_RUN_TIMEOUT)
+    stale = Q(heartbeat__lt=cutoff) | Q(heartbeat__isnull=True, created__lt=cutoff)
+    return PrintRun.objects.filter(stale, state=PrintRun.STATE_RUNNING).update(
+        state=PrintRun.STATE_FAILED, error=_('The print run was interrupted.'), finished=now(),
+    )
+
+
+def execute_run(pk):
+    from djobs.core.batch import render_cards, write_merged
+
+    if not claim_run(pk):
+        return
+    run = PrintRun.objects.get(pk=pk)
+
+    try:
+        run.manifest = manifest(printable_openings())
+        openings = changed_openings(printable_openings(), base=run.base)
+        run.total = len(openings)
+        run.save(update_fields=['total', 'manifest'])
+        if not openings and run.base_id:
+            # Like PrintAll, a delta without cards produces no (empty) PDF
+            run.state = PrintRun.STATE_FAILED
+            run.error = _('No cards have been added or changed since print run #{}.').format(run.base_id)
+            run.finished = now()
+            run.save(update_fields=['state', 'error', 'finished'])
+            return
+
+        def progress(cards):
+            for i, data in enumerate(cards, start=1):
+                yield data
+                PrintRun.objects.filter(pk=pk).update(done=i, heartbeat=now())
+
+        with TemporaryFile() as f:
+            write_merged(progress(render_cards(openings)), f)
+            f.seek(0)
+            run.file.save('printrun-{}.pdf'.format(run.pk), File(f), save=False)
+    except Exception as e:
+        run.state = PrintRun.STATE_FAILED
+        run.error = str(e)
+        run.finished = now()
+        run.save(update_fields=['state', 'error', 'finished'])
+        raise
+
+    run.done = run.total
+    run.state = PrintRun.STATE_DONE
+    run.finished = now()
+    run.save(update_fields=['file', 'done', 'state', 'finished'])
@@ -0,0 +1,60 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from io import BytesIO
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.urls import reverse
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib.units import mm
+from reportlab.pdfgen.canvas import Canvas
+
+QR_SIZE = 20 * mm
+
+_lock = threading.Lock()
+_codes = OrderedDict()
+
+
+@lru_cache(maxsize=4096)
+def detail_url(pk):
+    return urljoin(settings.SITE_URL, reverse('job.detail', kwargs={'pk': pk}))
+
+
+def _render(url):
+    d = Drawing(QR_SIZE, QR_SIZE)
+    d.add(QrCodeWidget(url, barHeight=QR_SIZE, barWidth=QR_SIZE))
+    canvas = Canvas(BytesIO())
+    start = len(canvas._code)
+    renderPDF.draw(d, canvas, 0, 0)
+    return '\n'.join(canvas._code[start:])
+
+
+def qr_code(url):
+    # PDF operators drawing the QR code for url at the origin, to be added with canvas.addLiteral()
+    with _lock:
+        code = _codes.get(url)
+        if code is not None:
+            _codes.move_to_end(url)
+            return code
+
+    code = _render(url)
+    with _lock:
+        _codes[url] = code
+        while len(_codes) > settings.QR_CACHE_SIZE:
+            _codes.popitem(last=False)
+    return code
+
+
+def precompute(openings):
+    # Encodes the QR codes of a batch of cards up front, e.g. before a print run renders them
+    for obj in openings:
+        if obj.pk:
+            qr_code(detail_url(obj.pk))
+
+
+def clear_cache():
+    with _lock:
+        _codes.clear()
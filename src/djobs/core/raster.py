@@ -0,0 +1,58 @@
+import importlib.util
+import shutil
+import subprocess
+import threading
+from io import BytesIO
+
+from django.conf import settings
+
+from djobs.core import metrics
+
+_lock = threading.Lock()
+
+
+def rasterizer():
+    if settings.PDF_RASTERIZER != 'auto':
+        return settings.PDF_RASTERIZER
+    if importlib.util.find_spec('pypdfium2') is not None:
+        return 'pdfium'
+    if shutil.which('pdftoppm'):
+        return 'pdftoppm'
+    return None
+
+
+def available():
+    return rasterizer() not in (None, 'none')
+
+
+def _pdfium(data, width):
+    import pypdfium2
+
+    # PDFium is not thread-safe
+    with _lock:
+        doc = pypdfium2.PdfDocument(data)
+        try:
+            page = doc[0]
+            image = page.render(scale=width / page.get_width()).to_pil()
+        finally:
+            doc.close()
+    out = BytesIO()
+    image.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def _pdftoppm(data, width):
+    return subprocess.run(
+        ['pdftoppm', '-png', '-singlefile', '-scale-to-x', str(width), '-scale-to-y', '-1', '-'],
+        input=data, stdout=subprocess.PIPE, check=True, timeout=30,
+    ).stdout
+
+
+def rasterize(data, width):
+    name = rasterizer()
+    with metrics.timer('rasterize'):
+        if name == 'pdfium':
+            return _pdfium(data, width)
+        elif name == 'pdftoppm':
+            return _pdftoppm(data, width)
+    raise ValueError('No PDF rasterizer available')
@@ -0,0 +1,116 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, Count, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_FIELDS = ('job_title', 'job_description', 'company_name', 'job_location')
+
+FTS_TABLE = 'core_jobopening_fts'
+POSTGRES_INDEX = 'core_jobopening_search'
+POSTGRES_VECTOR = "to_tsvector('simple', {})".format(
+    " || ' ' || ".join("coalesce(core_jobopening.{}, '')".format(f) for f in SEARCH_FIELDS)
+)
+
+_fts_available = None
+
+
+def install_search_index(schema_editor):
+    # Safe to run repeatedly, see restore_search_index
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        columns = ', '.join(SEARCH_FIELDS)
+        new = ', '.join('new.{}'.format(f) for f in SEARCH_FIELDS)
+        old = ', '.join('old.{}'.format(f) for f in SEARCH_FIELDS)
+        delete = "INSERT INTO {t}({t}, rowid, {c}) VALUES ('delete', old.id, {old});".format(
+            t=FTS_TABLE, c=columns, old=old
+        )
+        insert = "INSERT INTO {t}(rowid, {c}) VALUES (new.id, {new});".format(t=FTS_TABLE, c=columns, new=new)
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS {t} USING fts5({c}, content='core_jobopening', "
+            "content_rowid='id')".format(t=FTS_TABLE, c=columns)
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS {t}_ai AFTER INSERT ON core_jobopening BEGIN {i} END".format(
+                t=FTS_TABLE, i=insert
+            )
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS {t}_ad AFTER DELETE ON core_jobopening BEGIN {d} END".format(
+                t=FTS_TABLE, d=delete
+            )
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS {t}_au AFTER UPDATE ON core_jobopening BEGIN {d} {i} END".format(
+                t=FTS_TABLE, d=delete, i=insert
+            )
+        )
+        schema_editor.execute("INSERT INTO {t}({t}) VALUES ('rebuild')".format(t=FTS_TABLE))
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS {} ON core_jobopening USING gin(({}))".format(
+                POSTGRES_INDEX, POSTGRES_VECTOR.replace('core_jobopening.', '')
+            )
+        )
+
+
+def uninstall_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute('DROP TRIGGER IF EXISTS {}_{}'.format(FTS_TABLE, suffix))
+        schema_editor.execute('DROP TABLE IF EXISTS {}'.format(FTS_TABLE))
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(POSTGRES_INDEX))
+
+
+def restore_search_index(using):
+    # Migrations that add columns rebuild core_jobopening on SQLite, which drops the search triggers. They are
+    # restored after every migrate, as long as the search index is installed.
+    conn = connections[using]
+    if conn.vendor == 'sqlite' and FTS_TABLE in conn.introspection.table_names():
+        with conn.schema_editor() as schema_editor:
+            install_search_index(schema_editor)
+
+
+def _has_fts():
+    # Only a positive answer is kept: the index can still be installed by a migration while the process runs
+    global _fts_available
+    if not _fts_available:
+        _fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def search(qs, query):
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return qs
+
+    if connection.vendor == 'sqlite' and _has_fts():
+        match = ' '.join('"{}"*'.format(t) for t in terms)
+        return qs.filter(id__in=RawSQL('SELECT rowid FROM {t} WHERE {t} MATCH %s'.format(t=FTS_TABLE), [match]))
+    elif connection.vendor == 'postgresql':
+        return qs.filter(RawSQL(
+            "{} @@ plainto_tsquery('simple', %s)".format(POSTGRES_VECTOR), [' '.join(terms)],
+            output_field=BooleanField(),
+        ))
+
+    for t in terms:
+        q = Q()
+        for f in SEARCH_FIELDS:
+            q |= Q(**{'{}__icontains'.format(f): t})
+        qs = qs.filter(q)
+    return qs
+
+
+def facets(qs, locations=15):
+    return {
+        'remote': {
+            r['job_remote']: r['count']
+            for r in qs.order_by().values('job_remote').annotate(count=Count('id'))
+        },
+        'location': list(
+            qs.order_by().values('job_location').annotate(count=Count('id'))
+            .order_by('-count', 'job_location')[:locations]
+        ),
+    }
@@ -0,0 +1,48 @@
+from django.core.signals import request_started
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from djobs.core.accesscodes import invalidate_code
+from djobs.core.boardcache import bump_board_version
+from djobs.core.cardcache import invalidate_card
+from djobs.core.connections import check_connections
+from djobs.core.logos import create_variants
+from djobs.core.models import AccessCode, JobOpening
+from djobs.core.search import restore_search_index
+
+
+@receiver(post_save, sender=JobOpening)
+@receiver(post_delete, sender=JobOpening)
+def invalidate_card_cache(sender, instance, **kwargs):
+    invalidate_card(instance.pk)
+
+
+@receiver(post_save, sender=AccessCode)
+@receiver(post_delete, sender=AccessCode)
+def invalidate_access_code(sender, instance, **kwargs):
+    invalidate_code(instance.code)
+
+
+@receiver(post_save, sender=JobOpening)
+def create_logo_variants(sender, instance, **kwargs):
+    if instance.logo_ready:
+        create_variants(instance)
+
+
+@receiver(post_save, sender=JobOpening)
+@receiver(post_delete, sender=JobOpening)
+@receiver(post_save, sender=AccessCode)
+@receiver(post_delete, sender=AccessCode)
+def invalidate_board_cache(sender, instance, **kwargs):
+    bump_board_version()
+
+
+@receiver(request_started)
+def check_db_connections(sender, **kwargs):
+    check_connections()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, app_config, using, **kwargs):
+    if app_config.label == 'core':
+        restore_search_index(using)
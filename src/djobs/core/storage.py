@@ -0,0 +1,7 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+
+def private_storage():
+    # Outside MEDIA_ROOT, so the files have no public URL
+    return FileSystemStorage(location=settings.PRIVATE_ROOT, base_url=None)
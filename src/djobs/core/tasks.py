@@ -0,0 +1,29 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from djobs.core.connections import task_finished, task_started
+
+logger = logging.getLogger(__name__)
+_executor = None
+
+
+def _run(fn, args):
+    task_started()
+    try:
+        fn(*args)
+    except Exception:
+        logger.exception('Background task {} failed'.format(fn.__name__))
+    finally:
+        task_finished()
+
+
+def submit(fn, *args):
+    # With DJOBS_TASK_WORKER=external, pending work is picked up by `manage.py runworker` instead
+    global _executor
+    if settings.TASK_WORKER != 'thread':
+        return
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.TASK_THREADS)
+    _executor.submit(_run, fn, args)
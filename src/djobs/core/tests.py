@@ -0,0 +1,157 @@
+import base64
+import json
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from djobs.core import qr
+from djobs.core.accesscodes import resolve_code
+from djobs.core.models import AccessCode, JobOpening
+from djobs.core.pagination import decode_cursor, encode_cursor, keyset_page
+from djobs.core.search import search
+from djobs.core.uploads import process_logo
+
+
+def create_opening(**kwargs):
+    fields = {
+        'job_title': 'Developer', 'job_location': 'Berlin', 'job_description': 'Description',
+        'company_name': 'Company', 'company_contact': 'jobs@example.org',
+    }
+    fields.update(kwargs)
+    return JobOpening.objects.create(access_code=AccessCode.objects.create(), **fields)
+
+
+class QRPrecomputeTest(TestCase):
+
+    def test_precompute_encodes_each_card_once(self):
+        openings = [create_opening(company_name='Company {}'.format(i)) for i in range(3)]
+        qr.clear_cache()
+        with mock.patch('djobs.core.qr._render', wraps=qr._render) as render:
+            qr.precompute(openings)
+            self.assertEqual(render.call_count, 3)
+            for opening in openings:
+                qr.qr_code(qr.detail_url(opening.pk))
+            self.assertEqual(render.call_count, 3)
+
+    def test_precompute_skips_unsaved_openings(self):
+        with mock.patch('djobs.core.qr._render') as render:
+            qr.precompute([JobOpening()])
+        render.assert_not_called()
+
+
+class KeysetPaginationTest(TestCase):
+    fields = ('company_name', 'pk')
+
+    def setUp(self):
+        self.openings = [create_opening(company_name='Company {}'.format(i)) for i in range(3)]
+
+    def cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def test_next_page(self):
+        page = keyset_page(JobOpening.objects.all(), self.fields, 2)
+        self.assertEqual(list(page), self.openings[:2])
+        page = keyset_page(JobOpening.objects.all(), self.fields, 2, after=page.next_cursor)
+        self.assertEqual(list(page), self.openings[2:])
+        self.assertTrue(page.has_previous)
+        self.assertFalse(page.has_next)
+
+    def test_tampered_cursors(self):
+        for values in (['x', 'notint'], [{'a': 1}, 2], ['x', True], [None, 1], ['x', 1.5], ['x', 10 ** 30],
+                       ['x\x00', 1], ['x'], 'x'):
+            cursor = self.cursor(values)
+            self.assertIsNone(decode_cursor(cursor, self.fields))
+            for direction in ('after', 'before'):
+                page = keyset_page(JobOpening.objects.all(), self.fields, 2, **{direction: cursor})
+                self.assertEqual(list(page), self.openings[:2])
+                self.assertFalse(page.has_previous)
+
+    def test_cursor_past_the_end(self):
+        before = encode_cursor(self.openings[0], self.fields)
+        page = keyset_page(JobOpening.objects.all(), self.fields, 2, before=before)
+        self.assertEqual(list(page), self.openings[:2])
+        self.assertIsNone(page.previous_cursor)
+
+    def test_list_view(self):
+        response = self.client.get('/jobs/', {'after': self.cursor(['x', 'notint'])})
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=dict(settings.CACHES, default={'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}))
+class ResolveCodeTest(TestCase):
+
+    def test_existing_code(self):
+        opening = create_opening()
+        with self.assertNumQueries(1):
+            obj = resolve_code(opening.access_code.code)
+            self.assertEqual(obj.job, opening)
+
+    def test_missing_code_is_cached_until_created(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolve_code('NOPE'))
+            self.assertIsNone(resolve_code('NOPE'))
+        AccessCode.objects.create(code='NOPE')
+        self.assertEqual(resolve_code('NOPE').code, 'NOPE')
+
+
+class SearchTest(TestCase):
+
+    def test_search(self):
+        developer = create_opening(job_title='Python Developer')
+        create_opening(job_title='Designer')
+        self.assertEqual(list(search(JobOpening.objects.all(), 'pyth dev')), [developer])
+        developer.job_title = 'Tester'
+        developer.save()
+        self.assertEqual(list(search(JobOpening.objects.all(), 'python')), [])
+
+
+class ProcessLogoTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def logo(self, name, data=None):
+        if data is None:
+            buffer = BytesIO()
+            Image.new('RGB', (60, 30), (0, 0, 200)).save(buffer, 'PNG')
+            data = buffer.getvalue()
+        return SimpleUploadedFile(name, data)
+
+    def test_valid_logo(self):
+        opening = create_opening(logo=self.logo('logo.png'), logo_state=JobOpening.LOGO_PROCESSING)
+        process_logo(opening.pk)
+        opening.refresh_from_db()
+        self.assertTrue(opening.logo_ready)
+
+    def test_invalid_logo(self):
+        opening = create_opening(logo=self.logo('logo.png', b'not an image'), logo_state=JobOpening.LOGO_PROCESSING)
+        with self.assertLogs('djobs.core.uploads', 'WARNING'):
+            process_logo(opening.pk)
+        opening.refresh_from_db()
+        self.assertEqual(opening.logo_state, JobOpening.LOGO_INVALID)
+        self.assertFalse(opening.logo)
+
+    def test_logo_replaced_while_processing(self):
+        opening = create_opening(logo=self.logo('old.png', b'not an image'), logo_state=JobOpening.LOGO_PROCESSING)
+
+        def replace(path):
+            newer = JobOpening.objects.get(pk=opening.pk)
+            newer.logo = self.logo('new.png')
+            newer.save()
+            raise OSError('cannot identify image file')
+
+        with mock.patch('djobs.core.uploads.Image.open', side_effect=replace), self.assertLogs('djobs.core.uploads'):
+            process_logo(opening.pk)
+        opening.refresh_from_db()
+        self.assertEqual(opening.logo.name, 'new.png')
+        self.assertEqual(opening.logo_state, JobOpening.LOGO_PROCESSING)
@@ -0,0 +1,79 @@
+import logging
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.db import transaction
+
+from djobs.core import tasks
+from djobs.core.logos import LOGO_VARIANTS, create_variant
+from djobs.core.models import JobOpening
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedUploadHandler(FileUploadHandler):
+    # Skips files larger than UPLOAD_MAX_SIZE while they are being received. The names of the skipped
+    # fields are collected in request.upload_limit_exceeded, so forms can report them.
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_SIZE:
+            if not hasattr(self.request, 'upload_limit_exceeded'):
+                self.request.upload_limit_exceeded = []
+            self.request.upload_limit_exceeded.append(self.field_name)
+            raise SkipFile()
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def read_image_header(f):
+    # Only parses the header, the image data is decoded later by process_logo
+    f.seek(0)
+    with Image.open(f) as im:
+        size = im.size
+        image_format = im.format
+    f.seek(0)
+    return image_format, size
+
+
+def schedule_processing(opening: JobOpening):
+    transaction.on_commit(lambda: tasks.submit(process_logo, opening.pk))
+
+
+def process_logo(pk):
+    opening = JobOpening.objects.get(pk=pk)
+    if opening.logo_state != JobOpening.LOGO_PROCESSING:
+        return
+
+    name = opening.logo.name
+    state = JobOpening.LOGO_READY
+    # An empty name means the logo was removed before it was processed
+    if name:
+        try:
+            with Image.open(opening.logo.path) as im:
+                im.verify()
+            with Image.open(opening.logo.path) as im:
+                im.load()
+            for variant in LOGO_VARIANTS:
+                create_variant(opening.logo.path, variant)
+        except Exception:
+            logger.warning('Logo of job opening {} could not be processed'.format(pk), exc_info=True)
+            state = JobOpening.LOGO_INVALID
+
+    # The opening may have been saved with another logo in the meantime, so the result only applies if it still
+    # holds this one. It is then read again and saved, which updates content_hash and runs the post_save signals.
+    changes = {'logo_state': state}
+    if state == JobOpening.LOGO_INVALID:
+        changes['logo'] = None
+    if not JobOpening.objects.filter(pk=pk, logo=name, logo_state=JobOpening.LOGO_PROCESSING).update(**changes):
+        return
+    if state == JobOpening.LOGO_INVALID:
+        opening.logo.storage.delete(name)
+    JobOpening.objects.get(pk=pk).save(update_fields=['updated'])
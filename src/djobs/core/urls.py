@@ -1,11 +1,37 @@
+from django.conf import settings
 from django.urls import path
 
-from djobs.core.views import SubmitView, JobListView, JobDetailView, PrintPreView, PrintAll
+from djobs.core.views import (
+    SubmitView, JobListView, JobDetailView, PrintPreView, ImagePreView, LayoutPreView, PrintAll, PrintRunListView,
+    PrintRunStatusView, PrintRunDownloadView, LogoStateView,
+)
 
 urlpatterns = [
     path('submit/', SubmitView.as_view(), name='job.submit'),
     path('all/', PrintAll.as_view(), name='print.all'),
+    path('all/runs/', PrintRunListView.as_view(), name='print.runs'),
+    path('all/runs/<int:pk>/', PrintRunStatusView.as_view(), name='print.run.status'),
+    path('all/runs/<int:pk>/download/', PrintRunDownloadView.as_view(), name='print.run.download'),
     path('submit/preview/', PrintPreView.as_view(), name='job.preview'),
+    path('submit/preview.png', ImagePreView.as_view(), name='job.preview.png'),
+    path('submit/preview/layout/', LayoutPreView.as_view(), name='job.preview.layout'),
+    path('submit/logo/', LogoStateView.as_view(), name='job.logo.state'),
     path('<int:pk>/', JobDetailView.as_view(), name='job.detail'),
     path('', JobListView.as_view(), name='job.list'),
 ]
+
+if settings.ASYNC_VIEWS:
+    from djobs.core import asyncviews
+
+    async_views = {
+        'print.all': asyncviews.print_all,
+        'job.preview': asyncviews.print_preview,
+        'job.preview.png': asyncviews.image_preview,
+        'job.preview.layout': asyncviews.layout_preview,
+        'job.detail': asyncviews.job_detail,
+        'job.list': asyncviews.job_list,
+    }
+    urlpatterns = [
+        path(str(p.pattern), async_views[p.name], name=p.name) if p.name in async_views else p
+        for p in urlpatterns
+    ]
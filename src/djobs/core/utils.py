@@ -0,0 +1,36 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+CARD_FIELDS = (
+    'job_title', 'job_location', 'job_remote', 'job_salary_range', 'job_description',
+    'company_name', 'company_description', 'company_contact',
+)
+
+
+@lru_cache(maxsize=1024)
+def _file_digest(path, mtime, size):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_digest(path):
+    st = os.stat(path)
+    return _file_digest(path, st.st_mtime_ns, st.st_size)
+
+
+def opening_digest(obj):
+    data = {f: getattr(obj, f) for f in CARD_FIELDS}
+    data['pk'] = obj.pk
+    data['logo'] = None
+    # Logos still being processed are not printed. Historical models in migrations may lack logo_state.
+    if obj.logo and getattr(obj, 'logo_state', 'ready') == 'ready':
+        try:
+            data['logo'] = file_digest(obj.logo.path)
+        except OSError:
+            data['logo'] = obj.logo.name
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
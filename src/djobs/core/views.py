@@ -1,17 +1,36 @@
-from PyPDF2 import PdfFileMerger
+import cProfile
+import datetime
+import io
+import pstats
+
 from django import forms
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ClearableFileInput
-from django.http import HttpResponse
-from django.shortcuts import redirect
+from django.http import HttpResponse, JsonResponse, FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.urls import reverse
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.functional import cached_property
-from django.utils.translation import ugettext_lazy as _
-from django.views.generic import TemplateView, ListView, DetailView
-from io import BytesIO
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import gettext_lazy as _
+from django.views.generic import TemplateView, ListView, DetailView, View
 
-from djobs.core.models import AccessCode, JobOpening
-from djobs.core.pdf import PDFGenerator
+from djobs.core.accesscodes import resolve_code
+from djobs.core.boardcache import board_version, page_digest
+from djobs.core import raster
+from djobs.core.cardcache import card_key, render_card, render_card_image
+from djobs.core.models import JobOpening, PrintRun
+from djobs.core.pagination import keyset_page
+from djobs.core.printruns import changed_openings, fail_stale_runs, printable_openings, start_run
+from djobs.core.search import facets, search
+from djobs.core.uploads import read_image_header, schedule_processing
 
 
 class CustomFileInput(ClearableFileInput):
@@ -19,6 +38,29 @@ class CustomFileInput(ClearableFileInput):
 
 
 class JobOpeningForm(forms.ModelForm):
+    # Only the image header is read here, decoding happens in the background, see djobs.core.uploads
+    logo = forms.FileField(required=False, widget=CustomFileInput, label=_('Company logo'))
+
+    def __init__(self, *args, upload_limit_exceeded=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.upload_limit_exceeded = upload_limit_exceeded
+
+    def clean_logo(self):
+        logo = self.cleaned_data.get('logo')
+        if 'logo' in self.upload_limit_exceeded:
+            raise forms.ValidationError(_('The logo must not be larger than %(size)s.'), params={
+                'size': filesizeformat(settings.UPLOAD_MAX_SIZE)
+            })
+        if isinstance(logo, UploadedFile):
+            try:
+                image_format, (width, height) = read_image_header(logo)
+            except Exception:
+                raise forms.ValidationError(_('Upload a valid image. The file you uploaded was either not an image '
+                                              'or a corrupted image.'))
+            if width * height > settings.LOGO_MAX_PIXELS:
+                raise forms.ValidationError(_('The logo has too many pixels, please upload a smaller version.'))
+        return logo
+
     class Meta:
         model = JobOpening
         fields = [
@@ -50,16 +92,12 @@ class JobOpeningForm(forms.ModelForm):
         }
 
 
-class SubmitView(TemplateView):
+class AccessCodeMixin:
+    # Resolves ?code= to the access code and its job opening in one query, see djobs.core.accesscodes
 
     @cached_property
     def code(self):
-        try:
-            return AccessCode.objects.get(
-                code=self.request.GET.get('code')
-            )
-        except AccessCode.DoesNotExist:
-            return
+        return resolve_code(self.request.GET.get('code'))
 
     @cached_property
     def opening(self):
@@ -68,12 +106,29 @@ class SubmitView(TemplateView):
         except JobOpening.DoesNotExist:
             return JobOpening(access_code=self.code)
 
+
+class ProfileMixin:
+
+    def profile_requested(self):
+        return settings.PROFILING and self.request.GET.get('profile') == '1' and self.request.user.is_staff
+
+    def profile_response(self, func):
+        profiler = cProfile.Profile()
+        profiler.runcall(func)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(80)
+        return HttpResponse(out.getvalue(), content_type='text/plain')
+
+
+class SubmitView(AccessCodeMixin, TemplateView):
+
     @cached_property
     def form(self):
         return JobOpeningForm(
             data=self.request.POST if self.request.method == "POST" else None,
             files=self.request.FILES if self.request.method == "POST" else None,
-            instance=self.opening
+            instance=self.opening,
+            upload_limit_exceeded=getattr(self.request, 'upload_limit_exceeded', ()),
         )
 
     def get_template_names(self):
@@ -87,11 +142,18 @@ class SubmitView(TemplateView):
         if self.code:
             ctx['form'] = self.form
             ctx['opening'] = self.opening
+            ctx['image_preview'] = raster.available()
         return ctx
 
     def post(self, request, *args, **kwargs):
         if self.form.is_valid():
-            self.form.save()
+            opening = self.form.save(commit=False)
+            new_logo = 'logo' in self.form.changed_data and bool(opening.logo)
+            if 'logo' in self.form.changed_data:
+                opening.logo_state = JobOpening.LOGO_PROCESSING if new_logo else JobOpening.LOGO_READY
+            opening.save()
+            if new_logo:
+                schedule_processing(opening)
             messages.success(request, _('Your job posting has been saved!'))
             return redirect(request.path + '?code=' + self.code.code)
         else:
@@ -105,37 +167,121 @@ class SubmitView(TemplateView):
         return super().get(request, *args, **kwargs)
 
 
-class PrintPreView(TemplateView):
+class LogoStateView(AccessCodeMixin, View):
 
-    @cached_property
-    def code(self):
-        try:
-            return AccessCode.objects.get(
-                code=self.request.GET.get('code')
-            )
-        except AccessCode.DoesNotExist:
-            return
+    def get(self, request, *args, **kwargs):
+        if not self.code:
+            return JsonResponse({'error': 'invalid code'}, status=404)
+        return JsonResponse({'state': self.opening.logo_state if self.opening.logo else None})
 
-    @cached_property
-    def opening(self):
-        try:
-            return self.code.job
-        except JobOpening.DoesNotExist:
-            return JobOpening(access_code=self.code)
+
+class PrintPreView(ProfileMixin, AccessCodeMixin, TemplateView):
 
     def get(self, request, *args, **kwargs):
         if not self.code:
-            messages.error(request, _('The access code you inserted was not found in our database. Please contact '
-                                      'us if you think this is an error!'))
+            raise Http404()
+        if self.profile_requested():
+            # Bypasses the card cache so the report shows the actual rendering
+            from djobs.core.pdf import PDFGenerator
+            return self.profile_response(lambda: PDFGenerator(self.opening).create_pdf())
 
-        data = PDFGenerator(self.opening).create_pdf()
+        data = render_card(self.opening)
         resp = HttpResponse(data)
         resp['Content-Type'] = 'application/pdf'
         resp['Content-Disposition'] = 'inline; filename="preview.pdf"'
         return resp
 
 
-class JobDetailView(DetailView):
+class ImagePreView(PrintPreView):
+
+    def get(self, request, *args, **kwargs):
+        if not self.code or not raster.available():
+            raise Http404()
+        try:
+            width = int(request.GET.get('width', settings.PDF_PREVIEW_WIDTHS[0]))
+        except ValueError:
+            raise Http404()
+        if width not in settings.PDF_PREVIEW_WIDTHS:
+            raise Http404()
+
+        etag = None
+        if self.opening.pk:
+            etag = quote_etag('{}-{}'.format(card_key(self.opening).split(':')[1], width))
+            resp = get_conditional_response(request, etag=etag)
+            if resp:
+                return resp
+
+        resp = HttpResponse(render_card_image(self.opening, width), content_type='image/png')
+        resp['Cache-Control'] = 'private, no-cache'
+        if etag:
+            resp['ETag'] = etag
+        return resp
+
+
+class LayoutPreView(PrintPreView):
+    # Reports which fields of the (possibly unsaved) card would be cut off, without rendering a PDF
+
+    def measure(self, opening):
+        from djobs.core.pdf import PDFGenerator
+
+        shrink = self.request.GET.get('shrink')
+        layout = PDFGenerator(opening, shrink_to_fit=None if shrink is None else shrink == '1').measure()
+        return JsonResponse(layout)
+
+    def get(self, request, *args, **kwargs):
+        if not self.code:
+            return JsonResponse({'error': 'invalid code'}, status=404)
+        return self.measure(self.opening)
+
+    def post(self, request, *args, **kwargs):
+        if not self.code:
+            return JsonResponse({'error': 'invalid code'}, status=404)
+        form = JobOpeningForm(data=request.POST, instance=self.opening)
+        form.is_valid()  # copies the submitted values onto the unsaved instance
+        return self.measure(form.instance)
+
+
+def public_cache_state(request):
+    version = board_version()
+    return page_digest(version, request.get_full_path()), int(version)
+
+
+def cached_public_response(request, digest, last_modified):
+    # A 304 or the cached page, if there is one
+    response = get_conditional_response(request, etag=quote_etag(digest), last_modified=last_modified)
+    if response is None:
+        content = cache.get('djobs:board:page:{}'.format(digest))
+        if content is not None:
+            response = HttpResponse(content)
+    return response
+
+
+def add_public_cache_headers(response, digest, last_modified):
+    response['ETag'] = quote_etag(digest)
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class PublicCacheMixin:
+    # Pages are cached until any job opening or access code changes, see djobs.core.boardcache
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        digest, last_modified = public_cache_state(request)
+        response = cached_public_response(request, digest, last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response.render()
+            cache.set('djobs:board:page:{}'.format(digest), response.content, settings.PUBLIC_CACHE_TIMEOUT)
+
+        return add_public_cache_headers(response, digest, last_modified)
+
+
+class JobDetailView(PublicCacheMixin, DetailView):
     model = JobOpening
     context_object_name = 'job'
     template_name = 'core/detail.html'
@@ -144,27 +290,147 @@ class JobDetailView(DetailView):
         return JobOpening.objects.filter(active=True, public=True).order_by('company_name')
 
 
-class JobListView(ListView):
+class JobListView(PublicCacheMixin, ListView):
     model = JobOpening
     context_object_name = 'jobs'
     template_name = 'core/list.html'
+    paginate_by = 24
+    ordering = ('company_name', 'pk')
+
+    @cached_property
+    def searched_queryset(self):
+        qs = JobOpening.objects.filter(active=True, public=True)
+        if self.request.GET.get('q'):
+            qs = search(qs, self.request.GET['q'])
+        return qs
 
     def get_queryset(self):
-        return JobOpening.objects.filter(active=True, public=True).order_by('company_name')
+        qs = self.searched_queryset
+        if self.request.GET.get('remote') in ('0', '1'):
+            qs = qs.filter(job_remote=self.request.GET['remote'] == '1')
+        if self.request.GET.get('location'):
+            qs = qs.filter(job_location=self.request.GET['location'])
+        return qs.only(
+            'pk', 'job_title', 'job_location', 'job_remote', 'company_name'
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        # Seek past the last row shown instead of using OFFSET, see djobs.core.pagination
+        page = keyset_page(queryset, self.ordering, page_size,
+                           after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        return None, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        ctx['facets'] = facets(self.searched_queryset)
+        ctx['querystring'] = params.urlencode()
+        ctx['filters'] = {
+            'q': self.request.GET.get('q', ''),
+            'remote': self.request.GET.get('remote', ''),
+            'location': self.request.GET.get('location', ''),
+        }
+        return ctx
+
 
+class PrintAll(ProfileMixin, LoginRequiredMixin, TemplateView):
 
-class PrintAll(LoginRequiredMixin, TemplateView):
+    def get_openings(self):
+        # ?since=<ISO date or datetime> or ?since_run=<print run> only prints new and changed cards
+        since = self.request.GET.get('since')
+        if self.request.GET.get('since_run'):
+            try:
+                base_pk = int(self.request.GET['since_run'])
+            except ValueError:
+                raise Http404()
+            base = get_object_or_404(PrintRun, pk=base_pk, state=PrintRun.STATE_DONE)
+            return changed_openings(printable_openings(), base=base)
+        elif since:
+            try:
+                value = parse_datetime(since) or parse_date(since)
+            except ValueError:
+                value = None
+            if value is None:
+                raise Http404()
+            if not isinstance(value, datetime.datetime):
+                value = datetime.datetime.combine(value, datetime.time())
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value)
+            return changed_openings(printable_openings(), since=value)
+        return printable_openings()
 
     def get(self, request, *args, **kwargs):
-        jos = JobOpening.objects.filter(active=True, print_card=True)
-        merger = PdfFileMerger()
-        for j in jos:
-            data = PDFGenerator(j).create_pdf()
-            merger.append(BytesIO(data))
-        data = BytesIO()
-        merger.write(data)
-        data.seek(0)
-        resp = HttpResponse(data.read())
+        from djobs.core.batch import render_cards, stream_merged
+        from djobs.core.imposition import LAYOUTS
+
+        # ?layout=a4-2up or a3-4up places several cards on each sheet
+        layout = request.GET.get('layout') or None
+        if layout is not None and layout not in LAYOUTS:
+            raise Http404()
+
+        openings = self.get_openings()
+        if isinstance(openings, list) and not openings:
+            messages.info(request, _('No cards have been added or changed since then.'))
+            return redirect('print.runs')
+
+        if self.profile_requested():
+            from djobs.core.pdf import PDFGenerator
+            return self.profile_response(lambda: list(stream_merged(
+                (PDFGenerator(o).create_pdf() for o in openings), layout
+            )))
+
+        resp = StreamingHttpResponse(stream_merged(render_cards(openings), layout))
         resp['Content-Type'] = 'application/pdf'
         resp['Content-Disposition'] = 'inline; filename="preview.pdf"'
         return resp
+
+
+class PrintRunListView(LoginRequiredMixin, ListView):
+    model = PrintRun
+    context_object_name = 'runs'
+    template_name = 'core/printruns.html'
+
+    def get_queryset(self):
+        fail_stale_runs()
+        return PrintRun.objects.all()[:20]
+
+    def post(self, request, *args, **kwargs):
+        base = None
+        if request.POST.get('delta'):
+            base = PrintRun.objects.filter(state=PrintRun.STATE_DONE).first()
+        start_run(request.user, base=base)
+        messages.success(request, _('The print run has been started.'))
+        return redirect('print.runs')
+
+
+class PrintRunStatusView(LoginRequiredMixin, DetailView):
+    model = PrintRun
+
+    def get(self, request, *args, **kwargs):
+        fail_stale_runs()
+        run = self.get_object()
+        return JsonResponse({
+            'id': run.pk,
+            'state': run.state,
+            'total': run.total,
+            'done': run.done,
+            'progress': run.progress,
+            'error': run.error,
+            'download': (
+                reverse('print.run.download', kwargs={'pk': run.pk}) if run.state == PrintRun.STATE_DONE else None
+            ),
+        })
+
+
+class PrintRunDownloadView(LoginRequiredMixin, DetailView):
+    model = PrintRun
+
+    def get(self, request, *args, **kwargs):
+        run = get_object_or_404(PrintRun, pk=kwargs['pk'], state=PrintRun.STATE_DONE)
+        if not run.file:
+            raise Http404()
+        resp = FileResponse(run.file.open('rb'), content_type='application/pdf')
+        resp['Content-Disposition'] = 'inline; filename="printrun-{}.pdf"'.format(run.pk)
+        return resp
@@ -0,0 +1,26 @@
+import django
+from django.apps import apps
+
+# Entry points of the print worker processes. Workers are started from a clean interpreter, which unpickles these
+# functions before Django is set up, so this module must not import models at the top level.
+
+
+def init_worker(card_cache):
+    if not apps.ready:
+        django.setup()
+    # The parent's configuration, which may be overridden at runtime (e.g. the benchmark disables the cache)
+    from django.conf import settings
+    settings.CACHES = dict(settings.CACHES, **{settings.PDF_CARD_CACHE: card_cache})
+
+    from djobs.core.pdf import preload
+    preload()
+
+
+def render_chunk(openings):
+    # Metrics recorded here would be lost when the worker exits, so they travel back with the cards
+    from djobs.core import metrics
+    from djobs.core.cardcache import render_card
+    from djobs.core.qr import precompute
+    precompute(openings)
+    cards = [render_card(o) for o in openings]
+    return cards, metrics.collect()
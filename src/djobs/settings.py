@@ -8,6 +8,9 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.environ.get('DJOBS_DATA_DIR', os.path.join(BASE_DIR, 'data'))
 LOG_DIR = os.path.join(DATA_DIR, 'logs')
 MEDIA_ROOT = os.path.join(DATA_DIR, 'media')
+# Files that are only served through views with permission checks, such as finished print runs
+PRIVATE_ROOT = os.path.join(DATA_DIR, 'private')
+FILE_UPLOAD_TEMP_DIR = os.path.join(DATA_DIR, 'uploads')
 STATIC_ROOT = os.path.join(os.path.dirname(__file__), 'static.dist')
 
 if not os.path.exists(DATA_DIR):
@@ -16,6 +19,10 @@ if not os.path.exists(LOG_DIR):
     os.mkdir(LOG_DIR)
 if not os.path.exists(MEDIA_ROOT):
     os.mkdir(MEDIA_ROOT)
+if not os.path.exists(FILE_UPLOAD_TEMP_DIR):
+    os.mkdir(FILE_UPLOAD_TEMP_DIR)
+if not os.path.exists(PRIVATE_ROOT):
+    os.mkdir(PRIVATE_ROOT)
 
 SECRET_FILE = os.path.join(DATA_DIR, '.secret')
 if os.path.exists(SECRET_FILE):
@@ -46,6 +53,8 @@ else:
     EMAIL_USE_TLS = os.environ.get('DJOBS_MAIL_TLS', 'False') == 'True'
     EMAIL_USE_SSL = os.environ.get('DJOBS_MAIL_SSL', 'False') == 'True'
 
+# Seconds to keep database connections open between requests, "None" to keep them open indefinitely
+conn_max_age = os.getenv('DJOBS_DB_CONN_MAX_AGE', '0')
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.' + os.getenv('DJOBS_DB_TYPE', 'sqlite3'),
@@ -54,9 +63,12 @@ DATABASES = {
         'PASSWORD': os.getenv('DJOBS_DB_PASS', ''),
         'HOST': os.getenv('DJOBS_DB_HOST', ''),
         'PORT': os.getenv('DJOBS_DB_PORT', ''),
-        'CONN_MAX_AGE': 0,
+        'CONN_MAX_AGE': None if conn_max_age == 'None' else int(conn_max_age),
+        # Ping persistent connections before reusing them, see djobs.core.connections
+        'CONN_HEALTH_CHECKS': os.getenv('DJOBS_DB_CONN_HEALTH_CHECKS', 'False') == 'True',
     }
 }
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 SITE_URL = os.getenv('DJOBS_SITE_URL', 'http://localhost')
 if SITE_URL == 'http://localhost':
@@ -72,11 +84,63 @@ if os.getenv('DJOBS_COOKIE_DOMAIN', ''):
 SESSION_COOKIE_SECURE = os.getenv('DJOBS_HTTPS', 'True' if SITE_URL.startswith('https:') else 'False') == 'True'
 
 CACHES = {
+    # Must be shared by all worker processes: it holds the board version that invalidates the public pages
     'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-    }
+        'BACKEND': os.getenv('DJOBS_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('DJOBS_CACHE_LOCATION', os.path.join(DATA_DIR, 'cache', 'default')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DJOBS_CACHE_ENTRIES', '5000')),
+        },
+    },
+    'pdfcards': {
+        'BACKEND': os.getenv('DJOBS_CARD_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('DJOBS_CARD_CACHE_LOCATION', os.path.join(DATA_DIR, 'cache', 'cards')),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('DJOBS_CARD_CACHE_ENTRIES', '2000')),
+        },
+    },
 }
-SESSION_ENGINE = "django.contrib.sessions.backends.db"
+PDF_CARD_CACHE = 'pdfcards'
+PUBLIC_CACHE_TIMEOUT = int(os.getenv('DJOBS_PUBLIC_CACHE_TIMEOUT', '3600'))
+ACCESS_CODE_CACHE_TIMEOUT = int(os.getenv('DJOBS_ACCESS_CODE_CACHE_TIMEOUT', '300'))
+# "overlay" draws backgrounds directly while rendering a card, "merge" stamps cards onto the parsed background page
+PDF_COMPOSITING = os.getenv('DJOBS_PDF_COMPOSITING', 'overlay')
+PDF_BACKGROUNDS = {'default': 'background.pdf'}
+# Used for the PNG card preview: "auto", "pdfium" (needs pypdfium2), "pdftoppm" (needs poppler) or "none"
+PDF_RASTERIZER = os.getenv('DJOBS_PDF_RASTERIZER', 'auto')
+PDF_PREVIEW_WIDTHS = (600, 1200)
+PDF_SHRINK_TO_FIT = os.getenv('DJOBS_PDF_SHRINK_TO_FIT', 'False') == 'True'
+PDF_SHRINK_MIN_SCALE = float(os.getenv('DJOBS_PDF_SHRINK_MIN_SCALE', '0.6'))
+# Additional backgrounds per access code tag, e.g. "gold=backgrounds/gold.pdf,silver=/srv/silver.pdf"
+for bg in filter(None, os.getenv('DJOBS_PDF_BACKGROUNDS', '').split(',')):
+    bg_name, bg_path = bg.split('=', 1)
+    PDF_BACKGROUNDS[bg_name.strip()] = bg_path.strip()
+TASK_WORKER = os.getenv('DJOBS_TASK_WORKER', 'thread')
+TASK_THREADS = int(os.getenv('DJOBS_TASK_THREADS', '2'))
+# Uploads are streamed to FILE_UPLOAD_TEMP_DIR in chunks and dropped once they exceed UPLOAD_MAX_SIZE bytes
+FILE_UPLOAD_HANDLERS = [
+    'djobs.core.uploads.LimitedUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_MAX_SIZE = int(os.getenv('DJOBS_UPLOAD_MAX_SIZE', str(10 * 1024 * 1024)))
+LOGO_MAX_PIXELS = int(os.getenv('DJOBS_LOGO_MAX_PIXELS', str(50 * 1000 * 1000)))
+QR_CACHE_SIZE = int(os.getenv('DJOBS_QR_CACHE_SIZE', '5000'))
+PRINT_PROCESSES = int(os.getenv('DJOBS_PRINT_PROCESSES', str(os.cpu_count() or 1)))
+# Running print runs without progress for this many seconds are considered interrupted and marked as failed
+PRINT_RUN_TIMEOUT = int(os.getenv('DJOBS_PRINT_RUN_TIMEOUT', '600'))
+# Load fonts and PDF backgrounds when the WSGI application is created, e.g. in gunicorn --preload's master
+PDF_PRELOAD = os.getenv('DJOBS_PRELOAD', 'False') == 'True'
+# Serve the public and PDF views asynchronously, for deployments through djobs.asgi
+ASYNC_VIEWS = os.getenv('DJOBS_ASYNC_VIEWS', 'False') == 'True'
+ASYNC_RENDER_THREADS = int(os.getenv('DJOBS_ASYNC_RENDER_THREADS', str(os.cpu_count() or 1)))
+METRICS_TOKEN = os.getenv('DJOBS_METRICS_TOKEN', '')
+# Allows staff to append ?profile=1 to the PDF views to get a cProfile report instead of the PDF
+PROFILING = os.getenv('DJOBS_PROFILING', 'False') == 'True'
+# "db", "cached_db", "cache" or "signed_cookies". The cache engines use SESSION_CACHE_ALIAS, which must be shared
+# by all processes (i.e. not the default LocMemCache) and, for "cache", must not evict entries.
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.getenv('DJOBS_SESSION_ENGINE', 'db')
+SESSION_CACHE_ALIAS = os.getenv('DJOBS_SESSION_CACHE', 'default')
 
 # Application definition
 
@@ -149,10 +213,15 @@ MESSAGE_TAGS = {
     messages.WARNING: 'orange',
     messages.SUCCESS: 'green',
 }
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+# "session", "cookie" or "fallback" (cookie, and the session for messages that do not fit into it)
+MESSAGE_STORAGE = 'django.contrib.messages.storage.' + {
+    'session': 'session.SessionStorage',
+    'cookie': 'cookie.CookieStorage',
+    'fallback': 'fallback.FallbackStorage',
+}[os.getenv('DJOBS_MESSAGE_STORAGE', 'session')]
 
 # Password validation
-# https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
+# https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
 AUTH_PASSWORD_VALIDATORS = [
     {
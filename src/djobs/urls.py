@@ -1,6 +1,5 @@
 from django.conf import settings
-from django.conf.urls import url
-from django.urls import path, include
+from django.urls import include, path, re_path
 from django.views.static import serve
 
 from djobs.core.admin import site
@@ -13,7 +12,7 @@ urlpatterns = [
 
 if settings.DEBUG:
     urlpatterns += [
-        url(r'^jobs/media/(?P<path>.*)$', serve, {
+        re_path(r'^jobs/media/(?P<path>.*)$', serve, {
             'document_root': settings.MEDIA_ROOT,
         }),
     ]
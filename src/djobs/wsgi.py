@@ -4,13 +4,18 @@ WSGI config for djobs project.
 It exposes the WSGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
-https://docs.djangoproject.com/en/2.0/howto/deployment/wsgi/
+https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "djobs.settings")
 
 application = get_wsgi_application()
+
+if settings.PDF_PRELOAD:
+    from djobs.core.pdf import preload
+    preload()